@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+End-to-End Pipeline Benchmark for Cattle Breed Identification
+Runs synthetic data -> DataPreparator -> trainer input pipeline -> a few
+training steps -> export, recording per-stage wall time, throughput and peak
+memory in JSON so performance regressions show up without the Kaggle data
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import time
+from pathlib import Path
+
+from resource_monitor import StageTimer
+from synthetic_data import generate_synthetic_dataset
+
+
+def _dir_size(path):
+    return sum(p.stat().st_size for p in Path(path).rglob('*') if p.is_file())
+
+
+def run_benchmark(workdir='benchmark_run', breeds=None, images_per_breed=40, batch_size=16,
+                  input_batches=20, train_steps=5, export=True, backbone_weights=None,
+                  num_workers=None, link_mode=None):
+    """Run every pipeline stage inside workdir and return the timing report"""
+    workdir = Path(workdir).resolve()
+    if workdir.exists():
+        shutil.rmtree(workdir)
+    workdir.mkdir(parents=True)
+
+    timer = StageTimer()
+    original_cwd = os.getcwd()
+    # Trainer paths (models/, logs/, results/) are relative, so run inside workdir
+    os.chdir(workdir)
+
+    try:
+        from data_preparation import DataPreparator
+
+        with timer.stage('generate') as stage:
+            summary = generate_synthetic_dataset({
+                'output_dir': 'data/raw/indian_bovine',
+                'breeds': breeds,
+                'images_per_breed': images_per_breed
+            })
+            n_files = summary['images'] + summary['duplicates']
+            stage.items = n_files
+            stage.extra['bytes_written'] = summary['bytes']
+
+        with timer.stage('prepare', items=n_files) as stage:
+            preparator = DataPreparator(num_workers=num_workers, instrument=True, link_mode=link_mode)
+            preparator.setup_directories()
+            preparator.organize_datasets()
+            preparator.create_dataset_statistics()
+            preparator.create_class_mapping()
+            stage.extra['bytes_written'] = _dir_size(preparator.processed_dir)
+            with open(preparator.processed_dir / 'prep_timing.json') as f:
+                prep_timing = json.load(f)
+            stage.extra['substages'] = prep_timing['stages']
+            stage.extra['rejections'] = prep_timing['rejections']
+            stage.extra['placement'] = preparator.placement_report
+
+        # TensorFlow is imported only now so its startup shows up in its own stage
+        with timer.stage('import_tensorflow'):
+            from train_model import CONFIG, CattleBreedTrainer
+
+        config = {
+            **CONFIG,
+            'batch_size': batch_size,
+            'backbone_weights': backbone_weights,
+            'num_classes': len(breeds) if breeds else CONFIG['num_classes']
+        }
+        trainer = CattleBreedTrainer(config)
+        trainer.setup_directories()
+
+        with timer.stage('input_pipeline') as stage:
+            train_gen, val_gen = trainer.preprocess_images('data/processed/train')
+            config['num_classes'] = len(trainer.class_names)
+            n_batches = min(input_batches, len(train_gen))
+            images = 0
+            for i in range(n_batches):
+                x, _ = train_gen[i]
+                images += len(x)
+            stage.items = images
+            stage.extra['batch_dtype'] = str(x.dtype)
+            stage.extra['batch_bytes'] = int(x.nbytes)
+
+        with timer.stage('build_model') as stage:
+            model = trainer.create_model()
+            stage.extra['params'] = int(model.count_params())
+
+        with timer.stage('train_steps', items=train_steps * batch_size):
+            model.fit(train_gen, steps_per_epoch=min(train_steps, len(train_gen)), epochs=1, verbose=0)
+
+        if export:
+            with timer.stage('export') as stage:
+                trainer.convert_to_tensorflowjs()
+                stage.extra['tfjs_bytes'] = _dir_size(config['tfjs_output_dir'])
+                stage.extra['saved_model_bytes'] = _dir_size('models/cattle_breed_model')
+    finally:
+        os.chdir(original_cwd)
+
+    report = timer.report()
+    report['params'] = {
+        'breeds': breeds,
+        'images_per_breed': images_per_breed,
+        'batch_size': batch_size,
+        'input_batches': input_batches,
+        'train_steps': train_steps,
+        'export': export,
+        'link_mode': link_mode
+    }
+    report['environment'] = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S')
+    }
+    return report
+
+
+def main():
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description="Benchmark the training pipeline on synthetic data")
+    parser.add_argument('--workdir', default='benchmark_run')
+    parser.add_argument('--breeds', type=int, default=None, help="Use only the first N breeds")
+    parser.add_argument('--images-per-breed', type=int, default=40)
+    parser.add_argument('--batch-size', type=int, default=16)
+    parser.add_argument('--input-batches', type=int, default=20)
+    parser.add_argument('--train-steps', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--link-mode', choices=['hardlink', 'reflink', 'copy'], default=None)
+    parser.add_argument('--imagenet', action='store_true', help="Load ImageNet backbone weights from the weight store")
+    parser.add_argument('--skip-export', action='store_true')
+    parser.add_argument('--output', default='results/pipeline_benchmark.json')
+    args = parser.parse_args()
+
+    breeds = None
+    if args.breeds:
+        from data_preparation import DataPreparator
+        breeds = list(DataPreparator().target_breeds)[:args.breeds]
+
+    report = run_benchmark(
+        workdir=args.workdir,
+        breeds=breeds,
+        images_per_breed=args.images_per_breed,
+        batch_size=args.batch_size,
+        input_batches=args.input_batches,
+        train_steps=args.train_steps,
+        export=not args.skip_export,
+        backbone_weights='store' if args.imagenet else None,
+        num_workers=args.workers,
+        link_mode=args.link_mode
+    )
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print("\nPipeline benchmark:")
+    for name, stage in report['stages'].items():
+        rate = f", {stage['items_per_second']:.1f} items/s" if stage.get('items_per_second') else ''
+        print(f"  {name:<18} {stage['seconds']:8.2f}s  peak {stage['peak_rss_mb']:8.1f} MB{rate}")
+    print(f"Report saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Decode-Once Validation Cache for Cattle Breed Identification
+Decodes and resizes every validation image exactly once into a uint8 array
+(in memory or a reusable memory-mapped .npy), then serves deterministic,
+unaugmented batches for every epoch, optionally from a stratified subset
+"""
+
+import hashlib
+import json
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from tensorflow import keras
+
+
+def _cache_key(filepaths, target_size):
+    """Changes whenever a file, its size/mtime or the target size changes"""
+    entries = [(p, os.stat(p).st_size, int(os.stat(p).st_mtime)) for p in filepaths]
+    payload = json.dumps([list(target_size), entries]).encode()
+    return hashlib.sha256(payload).hexdigest()[:16]
+
+
+def _decode(path, target_size):
+    # Same loader and interpolation as flow_from_directory, so pixels match
+    img = keras.utils.load_img(path, target_size=target_size, interpolation='nearest')
+    return np.asarray(img, dtype=np.uint8)
+
+
+def _publish(tmp_path, cache_path):
+    """Move a finished cache file into place; False if another process published first"""
+    try:
+        # A hard link never overwrites, so exactly one concurrent builder wins
+        os.link(tmp_path, cache_path)
+    except FileExistsError:
+        os.unlink(tmp_path)
+        return False
+    except OSError:
+        # No hard links on this file system; both builders wrote the same bytes
+        os.replace(tmp_path, cache_path)
+        return True
+    os.unlink(tmp_path)
+    return True
+
+
+class CachedImageSet(keras.utils.Sequence):
+    """Fixed-order uint8 batches over a decode-once image cache.
+
+    Exposes classes, class_indices and filenames like a DirectoryIterator,
+    so evaluate_model and the other callers work unchanged.
+    """
+
+    def __init__(self, images, labels, class_indices, filenames, batch_size, indices=None,
+                 filepaths=None, build_seconds=0.0):
+        super().__init__()
+        self.images = images
+        self.filepaths = filepaths or []
+        self.labels = labels
+        self.class_indices = class_indices
+        self.num_classes = len(class_indices)
+        self.all_filenames = filenames
+        self.batch_size = batch_size
+        self.indices = np.arange(len(labels)) if indices is None else np.asarray(indices)
+        self.build_seconds = build_seconds
+
+    @classmethod
+    def from_directory_iterator(cls, iterator, cache_dir=None, num_threads=8):
+        """Decode the iterator's files once; with cache_dir, reuse or write a memory-mapped .npy"""
+        filepaths = list(iterator.filepaths)
+        target_size = tuple(iterator.target_size)
+        shape = (len(filepaths), *target_size, 3)
+        start = time.perf_counter()
+
+        images = None
+        if cache_dir:
+            cache_dir = Path(cache_dir)
+            cache_dir.mkdir(parents=True, exist_ok=True)
+            cache_path = cache_dir / f"val_{_cache_key(filepaths, target_size)}.npy"
+            if cache_path.exists():
+                images = np.load(cache_path, mmap_mode='r')
+                print(f"Validation cache hit: {cache_path} ({images.nbytes / 1e6:.0f} MB)")
+
+        if images is None:
+            if cache_dir:
+                # Unique per builder, so trainers filling the same cache never share a file
+                tmp_path = cache_dir / f".{cache_path.stem}.{os.getpid()}.{uuid.uuid4().hex[:8]}.tmp.npy"
+                images = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.uint8, shape=shape)
+            else:
+                images = np.empty(shape, dtype=np.uint8)
+
+            # Iterators backed by the shared image cache decode through it
+            load = getattr(iterator, 'load_image', None) or (lambda p: _decode(p, target_size))
+
+            try:
+                # PIL releases the GIL while decoding, so threads are enough here
+                with ThreadPoolExecutor(max_workers=num_threads) as pool:
+                    for i, pixels in enumerate(pool.map(load, filepaths)):
+                        images[i] = pixels
+            except BaseException:
+                if cache_dir:
+                    del images
+                    tmp_path.unlink(missing_ok=True)
+                raise
+
+            built = True
+            if cache_dir:
+                images.flush()
+                del images
+                built = _publish(tmp_path, cache_path)
+                images = np.load(cache_path, mmap_mode='r')
+            if built:
+                print(f"Validation cache built: {len(filepaths)} images, {images.nbytes / 1e6:.0f} MB "
+                      f"in {time.perf_counter() - start:.1f}s")
+            else:
+                print(f"Validation cache hit: {cache_path} (built concurrently by another process)")
+
+        return cls(
+            images,
+            np.asarray(iterator.classes),
+            dict(iterator.class_indices),
+            list(iterator.filenames),
+            iterator.batch_size,
+            filepaths=filepaths,
+            build_seconds=time.perf_counter() - start
+        )
+
+    @property
+    def classes(self):
+        return self.labels[self.indices]
+
+    @property
+    def filenames(self):
+        return [self.all_filenames[i] for i in self.indices]
+
+    @property
+    def samples(self):
+        return len(self.indices)
+
+    def __len__(self):
+        return int(np.ceil(len(self.indices) / self.batch_size))
+
+    def __getitem__(self, index):
+        batch = self.indices[index * self.batch_size:(index + 1) * self.batch_size]
+        x = np.asarray(self.images[batch])
+        y = keras.utils.to_categorical(self.labels[batch], self.num_classes).astype(np.float32)
+        return x, y
+
+    def stratified_subset(self, fraction, seed=42):
+        """View over a fixed per-class fraction of the images, sharing the same cache"""
+        rng = np.random.default_rng(seed)
+        keep = []
+        for label in np.unique(self.labels[self.indices]):
+            members = self.indices[self.labels[self.indices] == label]
+            count = max(1, int(round(len(members) * fraction)))
+            keep.append(np.sort(rng.choice(members, count, replace=False)))
+        return CachedImageSet(self.images, self.labels, self.class_indices, self.all_filenames,
+                              self.batch_size, np.sort(np.concatenate(keep)), self.filepaths,
+                              self.build_seconds)
+
+    def decode_seconds_per_image(self, sample=64):
+        """JPEG decode + resize cost per image that the cache avoids, from a small sample"""
+        paths = self.filepaths[:sample]
+        if not paths:
+            return None
+        size = self.images.shape[1:3]
+        start = time.perf_counter()
+        for path in paths:
+            _decode(path, size)
+        return (time.perf_counter() - start) / len(paths)
+
+    def input_pass_seconds(self):
+        """Wall time to produce every batch once (input pipeline only, no model)"""
+        start = time.perf_counter()
+        for i in range(len(self)):
+            self[i]
+        return time.perf_counter() - start
+
+
+def validation_savings(full_set, fit_set, pass_seconds, epochs):
+    """Measured validation cost vs an estimate of re-decoding the full set every epoch"""
+    passes = len(pass_seconds)
+    report = {
+        'images': full_set.samples,
+        'fit_images': fit_set.samples,
+        'epochs': epochs,
+        'validation_passes': passes,
+        'mean_validation_seconds': float(np.mean(pass_seconds)) if passes else None,
+        'total_validation_seconds': float(np.sum(pass_seconds))
+    }
+    if not isinstance(full_set, CachedImageSet) or not passes or not epochs:
+        return report
+
+    cached_pass = fit_set.input_pass_seconds()
+    decode_per_image = full_set.decode_seconds_per_image()
+    model_per_image = max(0.0, report['mean_validation_seconds'] - cached_pass) / fit_set.samples
+    uncached_per_epoch = full_set.samples * (model_per_image + decode_per_image)
+    cached_per_epoch = report['total_validation_seconds'] / epochs
+
+    report.update({
+        'cache_bytes': int(full_set.images.nbytes),
+        'memory_mapped': isinstance(full_set.images, np.memmap),
+        'cache_build_seconds': full_set.build_seconds,
+        'cached_input_seconds_per_pass': cached_pass,
+        'decode_ms_per_image': decode_per_image * 1000,
+        'uncached_seconds_per_epoch_estimate': uncached_per_epoch,
+        'cached_seconds_per_epoch': cached_per_epoch,
+        'seconds_saved_per_epoch': uncached_per_epoch - cached_per_epoch
+    })
+    return report
+
+
+class ValidationTimer(keras.callbacks.Callback):
+    """Records wall time of every validation pass run by fit()"""
+
+    def __init__(self):
+        super().__init__()
+        self.seconds = []
+
+    def on_test_begin(self, logs=None):
+        self._start = time.perf_counter()
+
+    def on_test_end(self, logs=None):
+        self.seconds.append(time.perf_counter() - self._start)
@@ -5,18 +5,64 @@ Downloads and organizes Kaggle datasets for training
 """
 
 import os
+import io
+import argparse
 import shutil
 import zipfile
 import json
+import hashlib
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 import pandas as pd
 from PIL import Image
 import numpy as np
-from sklearn.model_selection import train_test_split
+
+from dataset_sources import BreedMatcher, FolderPerClassSource, detect_source, iter_all_records
+from prep_instrumentation import PrepInstrumentation
+
+# Cumulative split boundaries on [0, 1): 70% train, 15% validation, 15% test
+SPLIT_BOUNDARIES = [('train', 0.70), ('validation', 0.85), ('test', 1.0)]
+
+def assign_split(digest):
+    """Split for an image, fixed by its content hash so it never moves as the dataset grows"""
+    position = int(digest[:16], 16) / 16 ** 16
+    for split, boundary in SPLIT_BOUNDARIES:
+        if position < boundary:
+            return split
+    return SPLIT_BOUNDARIES[-1][0]
+
+# Linux ioctl that clones file extents (btrfs, XFS, ...) without copying data
+FICLONE = 0x40049409
+
+def place_file(src, dest, mode):
+    """Put src at dest without re-encoding; returns the method that worked.
+    
+    mode 'hardlink' tries a hard link, then a reflink, then a copy; 'reflink'
+    starts at the reflink; 'copy' always copies.
+    """
+    if mode == 'hardlink':
+        try:
+            os.link(src, dest)
+            return 'hardlink'
+        except OSError:
+            pass
+    if mode in ('hardlink', 'reflink'):
+        try:
+            import fcntl
+            with open(src, 'rb') as s, open(dest, 'wb') as d:
+                fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+            return 'reflink'
+        except (ImportError, OSError):
+            if os.path.exists(dest):
+                os.unlink(dest)
+    shutil.copyfile(src, dest)
+    return 'copy'
 
 class DataPreparator:
-    def __init__(self):
-        self.base_dir = Path("data")
+    def __init__(self, num_workers=None, base_dir="data", instrument=False, link_mode=None):
+        self.base_dir = Path(base_dir)
         self.raw_dir = self.base_dir / "raw"
         self.processed_dir = self.base_dir / "processed"
         self.train_dir = self.processed_dir / "train"
@@ -73,6 +119,15 @@ class DataPreparator:
             'Surti': 'buffalo'
         }
         
+        self.num_workers = num_workers or os.cpu_count() or 1
+        # Per-stage timing report (data/processed/prep_timing.json) and live progress
+        self.instrument = instrument
+        # None transcodes everything; 'hardlink', 'reflink' or 'copy' place RGB JPEG sources as-is
+        self.link_mode = link_mode
+        self.placement_report = None
+        self.min_images_per_breed = 10
+        self.breed_matcher = BreedMatcher(self.target_breeds)
+        
     def setup_directories(self):
         """Create directory structure"""
         directories = [
@@ -126,96 +181,310 @@ class DataPreparator:
                 
     def validate_and_filter_images(self, image_path):
         """Validate image quality and format"""
+        return self.rejection_reason(image_path) is None
+        
+    def rejection_reason(self, image_path):
+        """Why an image fails validation, or None if it passes"""
         try:
             with Image.open(image_path) as img:
                 # Check format
                 if img.format not in ['JPEG', 'JPG', 'PNG']:
-                    return False
+                    return 'format'
                     
                 # Check size
                 if img.size[0] < 100 or img.size[1] < 100:
-                    return False
+                    return 'too_small'
                     
                 # Check aspect ratio (not too extreme)
                 aspect_ratio = max(img.size) / min(img.size)
                 if aspect_ratio > 5:
-                    return False
+                    return 'aspect_ratio'
                     
                 # Check if image is corrupted
                 img.verify()
-                return True
+                
+            # verify() only checks structure and misses truncated files,
+            # so decode the pixels as well
+            if hasattr(image_path, 'seek'):
+                image_path.seek(0)
+            with Image.open(image_path) as img:
+                img.load()
+            return None
                 
         except Exception:
-            return False
+            return 'corrupt'
             
-    def organize_indian_bovine_data(self):
-        """Organize Indian Bovine dataset"""
-        source_dir = self.raw_dir / 'indian_bovine'
+    def get_sources(self):
+        """Source adapters for every raw dataset; add new datasets here"""
+        return [
+            FolderPerClassSource(self.raw_dir / 'indian_bovine', self.breed_matcher, name='indian_bovine'),
+            detect_source(self.raw_dir / 'cattle_breeds', self.breed_matcher, name='cattle_breeds')
+            or FolderPerClassSource(self.raw_dir / 'cattle_breeds', self.breed_matcher, name='cattle_breeds'),
+        ]
+        
+    def validate_record(self, record):
+        """Validate a streamed ImageRecord.
         
-        if not source_dir.exists():
-            print("Indian Bovine dataset not found. Please download first.")
-            return
+        Returns (content SHA-256 or None, rejection reason or None, timings);
+        timings is None unless the preparator is instrumented.
+        """
+        start = time.perf_counter()
+        try:
+            with record.open() as f:
+                data = f.read()
+        except (OSError, KeyError):
+            return None, 'unreadable', None
+        read_done = time.perf_counter()
+        
+        reason = self.rejection_reason(io.BytesIO(data))
+        validate_done = time.perf_counter()
+        digest = hashlib.sha256(data).hexdigest() if reason is None else None
+        
+        timings = None
+        if self.instrument:
+            timings = {
+                'read': (read_done - start, len(data), 0),
+                'validate': (validate_done - read_done, 0, 0),
+            }
+            if digest:
+                timings['hash'] = (time.perf_counter() - validate_done, 0, 0)
+        return digest, reason, timings
             
-        print("Organizing Indian Bovine dataset...")
+    def is_conformant(self, record):
+        """True if the source is a complete RGB JPEG that can be placed as-is.
+
+        Format and mode come from the header. The end-of-image marker is
+        checked as well, so a truncated file is never linked even if it
+        slipped past validation (which decodes every image in full).
+        """
+        with record.open() as f, Image.open(f) as img:
+            if img.format != 'JPEG' or img.mode != 'RGB':
+                return False
+            size = f.seek(0, io.SEEK_END)
+            f.seek(max(0, size - 64))
+            # Some encoders pad after the marker
+            return f.read().rstrip(b'\x00\r\n ').endswith(b'\xff\xd9')
+            
+    def transcode_record(self, task):
+        """Place a record as an RGB JPEG at its destination path.
         
-        # Map dataset folders to our breed names
-        breed_mapping = {}
+        Returns (method, bytes saved, timings): method is 'transcode' or, in
+        link mode for conformant sources, 'hardlink', 'reflink' or 'copy',
+        and 'corrupt' if the source could not be decoded (nothing is left at
+        the destination); timings is None unless the preparator is instrumented.
+        """
+        try:
+            return self._place_record(*task)
+        except Exception:
+            # One bad file must not take down the whole parallel stage
+            task[1].unlink(missing_ok=True)
+            return 'corrupt', 0, None
+            
+    def _place_record(self, record, dest_path):
+        start = time.perf_counter()
         
-        for folder in source_dir.iterdir():
-            if folder.is_dir():
-                folder_name = folder.name
-                # Try to match with our target breeds
-                for breed in self.target_breeds.keys():
-                    if breed.lower().replace('_', ' ') in folder_name.lower():
-                        breed_mapping[folder] = breed
-                        break
-                        
-        # Copy and organize images
-        for source_folder, breed_name in breed_mapping.items():
-            print(f"Processing {breed_name}...")
+        if self.link_mode and self.is_conformant(record):
+            if record.member is None:
+                method = place_file(record.path, dest_path, self.link_mode)
+            else:
+                # Archive members can't be linked, but their bytes can be used as-is
+                with record.open() as f:
+                    dest_path.write_bytes(f.read())
+                method = 'copy'
+            size = dest_path.stat().st_size
+            saved = size if method in ('hardlink', 'reflink') else 0
+            timings = {method: (time.perf_counter() - start, 0, size - saved)} if self.instrument else None
+            return method, saved, timings
             
-            images = []
-            for ext in ['*.jpg', '*.jpeg', '*.png', '*.JPG', '*.JPEG', '*.PNG']:
-                images.extend(source_folder.glob(ext))
-                
-            # Filter valid images
-            valid_images = [img for img in images if self.validate_and_filter_images(img)]
+        with record.open() as f, Image.open(f) as img:
+            img.load()
+            if img.mode != 'RGB':
+                img = img.convert('RGB')
+            decode_done = time.perf_counter()
+            img.save(dest_path, 'JPEG', quality=95)
+            bytes_read = f.seek(0, io.SEEK_END) if self.instrument else 0
             
-            if len(valid_images) < 10:  # Skip breeds with too few images
-                print(f"Skipping {breed_name}: only {len(valid_images)} valid images")
-                continue
-                
-            # Split into train/val/test
-            train_imgs, temp_imgs = train_test_split(valid_images, test_size=0.3, random_state=42)
-            val_imgs, test_imgs = train_test_split(temp_imgs, test_size=0.5, random_state=42)
+        if not self.instrument:
+            return 'transcode', 0, None
+        return 'transcode', 0, {
+            'decode': (decode_done - start, bytes_read, 0),
+            'encode': (time.perf_counter() - decode_done, 0, dest_path.stat().st_size)
+        }
             
-            # Copy images to respective directories
-            for split, img_list in [('train', train_imgs), ('validation', val_imgs), ('test', test_imgs)]:
-                split_dir = getattr(self, f"{split.replace('validation', 'val')}_dir") / breed_name
-                
-                for i, img_path in enumerate(img_list):
-                    dest_path = split_dir / f"{breed_name}_{i:04d}.jpg"
+    def organize_sources(self, sources, prune=False):
+        """Stream records from all sources through one validate/transcode/split stage.
+        
+        Each image's split and file name come from its content hash, so images
+        already in data/processed are left untouched and only new ones are
+        transcoded. With prune=True, processed images whose source is gone
+        (or that use the old index-based names) are deleted.
+        """
+        chunksize = 32
+        valid_by_breed = defaultdict(dict)
+        instrumentation = PrepInstrumentation(enabled=self.instrument)
+        
+        with ProcessPoolExecutor(max_workers=self.num_workers) as executor:
+            # Validate while the adapters are still walking the disk
+            records = instrumentation.iterate('discover', iter_all_records(sources))
+            pending = []
+            validation_start = time.perf_counter()
+            seen = 0
+            
+            def drain(batch):
+                nonlocal seen
+                results = executor.map(self.validate_record, batch, chunksize=chunksize)
+                for record, (digest, reason, timings) in zip(batch, results):
+                    instrumentation.add_worker_timings(timings)
+                    if reason:
+                        instrumentation.reject(reason)
+                    elif digest in valid_by_breed[record.breed]:
+                        # Identical bytes under one breed are kept once
+                        instrumentation.reject('duplicate')
+                    else:
+                        valid_by_breed[record.breed][digest] = record
+                seen += len(batch)
+                instrumentation.progress('validated', seen, start=validation_start)
+            
+            with instrumentation.stage('validate_wall'):
+                for record in records:
+                    pending.append(record)
+                    if len(pending) >= chunksize * self.num_workers * 4:
+                        drain(pending)
+                        pending = []
+                drain(pending)
+            instrumentation.progress('validated', seen, start=validation_start, final=True)
+            
+            # Assign splits by hash, then transcode only images not yet on disk
+            tasks = []
+            placed = []
+            with instrumentation.stage('assign_split'):
+                for breed_name in sorted(valid_by_breed):
+                    valid_images = valid_by_breed[breed_name]
                     
-                    # Convert to RGB and save as JPEG
-                    with Image.open(img_path) as img:
-                        if img.mode != 'RGB':
-                            img = img.convert('RGB')
-                        img.save(dest_path, 'JPEG', quality=95)
+                    if len(valid_images) < self.min_images_per_breed:  # Skip breeds with too few images
+                        print(f"Skipping {breed_name}: only {len(valid_images)} valid images")
+                        instrumentation.reject('breed_too_small', len(valid_images))
+                        continue
                         
-            print(f"  {breed_name}: {len(train_imgs)} train, {len(val_imgs)} val, {len(test_imgs)} test")
+                    for digest, record in sorted(valid_images.items()):
+                        split = assign_split(digest)
+                        split_dir = getattr(self, f"{split.replace('validation', 'val')}_dir") / breed_name
+                        dest_path = split_dir / f"{breed_name}_{digest[:16]}.jpg"
+                        placed.append((breed_name, split, digest, record, dest_path))
+                        if not dest_path.exists():
+                            tasks.append((record, dest_path))
+                            
+            with instrumentation.stage('transcode_wall'):
+                placement, failed = self._transcode_all(executor, tasks, chunksize, instrumentation)
+                
+        # Images that failed to transcode are left out of the splits and manifest
+        expected = set()
+        summary = {}
+        manifest = {}
+        for breed_name, split, digest, record, dest_path in placed:
+            if dest_path in failed:
+                continue
+            expected.add(dest_path)
+            counts = summary.setdefault(breed_name, {'train': 0, 'validation': 0, 'test': 0})
+            counts[split] += 1
+            manifest[digest] = {
+                'breed': breed_name,
+                'split': split,
+                'file': str(dest_path.relative_to(self.processed_dir)),
+                'source': record.key
+            }
+        summary = {breed: (c['train'], c['validation'], c['test']) for breed, c in summary.items()}
             
-    def organize_cattle_breeds_data(self):
-        """Organize additional cattle breeds dataset"""
-        source_dir = self.raw_dir / 'cattle_breeds'
+        with instrumentation.stage('prune'):
+            removed = self.prune_processed(expected) if prune else 0
         
-        if not source_dir.exists():
-            print("Cattle breeds dataset not found.")
-            return
+        with open(self.processed_dir / 'split_manifest.json', 'w') as f:
+            json.dump(manifest, f, indent=2)
             
-        print("Organizing additional cattle breeds dataset...")
+        for breed_name, (n_train, n_val, n_test) in summary.items():
+            print(f"  {breed_name}: {n_train} train, {n_val} val, {n_test} test")
+            if not n_val or not n_test:
+                print(f"    ⚠️ {breed_name} has an empty validation or test split; add more images")
+        print(f"Placed {len(tasks) - len(failed)} new images, kept {len(placed) - len(tasks)} existing"
+              + (f", removed {removed} stale" if prune else ""))
+        if tasks:
+            print("  " + ", ".join(f"{method} {count}" for method, count in placement['files'].items())
+                  + (f"; {placement['bytes_saved'] / 1e6:.1f} MB saved by linking" if placement['bytes_saved'] else ""))
+        if failed:
+            print(f"  ⚠️ {len(failed)} images could not be decoded and were skipped")
+        self.placement_report = placement
+        
+        instrumentation.write(self.processed_dir / 'prep_timing.json')
+        return summary
         
-        # Similar processing for the second dataset
-        # This would supplement the main dataset
+    def _transcode_all(self, executor, tasks, chunksize, instrumentation):
+        """Place tasks (grouped by breed), with progress and per-breed cost when instrumented.
+        
+        Returns ({'files': count per method, 'bytes_saved': bytes not duplicated
+        on disk, 'failed': count}, set of destination paths that failed).
+        """
+        results = executor.map(self.transcode_record, tasks, chunksize=chunksize)
+        placement = {'files': Counter(), 'bytes_saved': 0}
+        failed = set()
+        
+        # executor.map hands results back in chunks, so parent-side timestamps
+        # say nothing about a single breed: the rate and ETA use one clock
+        # over the whole stage, and per-breed cost comes from worker timings
+        stage_start = time.perf_counter()
+        breeds = defaultdict(lambda: {'images': 0, 'worker_seconds': 0.0, 'bytes_written': 0})
+        done = 0
+        for (record, dest_path), (method, saved, timings) in zip(tasks, results):
+            if method == 'corrupt':
+                failed.add(dest_path)
+                instrumentation.reject('corrupt')
+            else:
+                placement['files'][method] += 1
+                placement['bytes_saved'] += saved
+            if not instrumentation.enabled:
+                continue
+                
+            instrumentation.add_worker_timings(timings)
+            breed = breeds[record.breed]
+            breed['images'] += 1
+            for seconds, _, bytes_written in (timings or {}).values():
+                breed['worker_seconds'] += seconds
+                breed['bytes_written'] += bytes_written
+            done += 1
+            instrumentation.progress(f"transcode ({record.breed})", done, len(tasks), stage_start)
+        if done:
+            instrumentation.progress('transcode', done, len(tasks), stage_start, final=True)
+        for name, breed in breeds.items():
+            instrumentation.breed_done(name, breed['images'], breed['worker_seconds'], breed['bytes_written'])
+            
+        placement['files'] = dict(placement['files'])
+        placement['failed'] = len(failed)
+        instrumentation.placement = placement
+        return placement, failed
+        
+    def prune_processed(self, expected):
+        """Delete processed images that are not in the expected set"""
+        removed = 0
+        for split_dir in [self.train_dir, self.val_dir, self.test_dir]:
+            for image_path in split_dir.glob('*/*.jpg'):
+                if image_path not in expected:
+                    image_path.unlink()
+                    removed += 1
+        return removed
+        
+    def organize_datasets(self):
+        """Merge every available raw dataset into the processed splits"""
+        print("Organizing datasets...")
+        return self.organize_sources(self.get_sources(), prune=True)
+        
+    def organize_indian_bovine_data(self):
+        """Organize Indian Bovine dataset on its own"""
+        print("Organizing Indian Bovine dataset...")
+        return self.organize_sources(self.get_sources()[:1])
+        
+    def organize_cattle_breeds_data(self):
+        """Organize additional cattle breeds dataset on its own"""
+        print("Organizing additional cattle breeds dataset...")
+        return self.organize_sources(self.get_sources()[1:])
         
     def create_dataset_statistics(self):
         """Generate dataset statistics"""
@@ -255,28 +524,49 @@ class DataPreparator:
             print(f"{split.capitalize()}: {split_data['total_images']} images")
             
     def create_class_mapping(self):
-        """Create class mapping for model training"""
+        """Create class mapping for model training
+        
+        Ids are stable: breeds already in an existing class_mapping.json keep
+        their id and newly added breeds are appended after them.
+        """
+        mapping_path = self.processed_dir / 'class_mapping.json'
+        existing = {}
+        if mapping_path.exists():
+            with open(mapping_path) as f:
+                existing = json.load(f).get('breed_to_id', {})
+                
         class_mapping = {
             'breed_to_id': {},
             'id_to_breed': {},
             'breed_types': self.target_breeds
         }
         
-        for i, breed in enumerate(sorted(self.target_breeds.keys())):
+        ordered = sorted(existing, key=existing.get)
+        ordered += sorted(b for b in self.target_breeds if b not in existing)
+        
+        for i, breed in enumerate(ordered):
             class_mapping['breed_to_id'][breed] = i
             class_mapping['id_to_breed'][i] = breed
             
-        with open(self.processed_dir / 'class_mapping.json', 'w') as f:
+        with open(mapping_path, 'w') as f:
             json.dump(class_mapping, f, indent=2)
             
         return class_mapping
 
 def main():
     """Main data preparation pipeline"""
+    parser = argparse.ArgumentParser(description="Prepare the cattle breed dataset")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--profile', action='store_true',
+                        help="Show per-breed progress and write data/processed/prep_timing.json")
+    parser.add_argument('--link-mode', choices=['hardlink', 'reflink', 'copy'], default=None,
+                        help="Link or copy sources that are already RGB JPEGs instead of re-encoding them")
+    args = parser.parse_args()
+    
     print("🐄 Preparing Cattle Breed Dataset for Training")
     print("=" * 50)
     
-    preparator = DataPreparator()
+    preparator = DataPreparator(num_workers=args.workers, instrument=args.profile, link_mode=args.link_mode)
     
     # Setup directory structure
     print("Setting up directories...")
@@ -289,9 +579,8 @@ def main():
         print(f"Error downloading data: {e}")
         print("Please download datasets manually and place in data/raw/")
         
-    # Organize datasets
-    preparator.organize_indian_bovine_data()
-    preparator.organize_cattle_breeds_data()
+    # Organize all datasets in a single merged pass
+    preparator.organize_datasets()
     
     # Generate statistics and mappings
     preparator.create_dataset_statistics()
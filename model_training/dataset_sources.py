@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Dataset Source Adapters for Cattle Breed Identification
+Streams (image, breed) records out of differently shaped raw datasets so that
+DataPreparator can validate, transcode and split them in one shared pass
+"""
+
+import csv
+import io
+import os
+import re
+import zipfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png'}
+
+# Spellings seen in public datasets that don't normalise to our breed names
+BREED_ALIASES = {
+    'Holstein_Friesian': ['holstein', 'hf', 'friesian', 'holstein friesian cattle'],
+    'Red_Sindhi': ['sindhi', 'red sindhi cattle'],
+    'Nili_Ravi': ['niliravi', 'nili-ravi', 'neeli ravi'],
+    'Jaffarabadi': ['jafarabadi', 'jaffrabadi'],
+    'Krishna_Valley': ['krishna'],
+    'Amritmahal': ['amrit mahal', 'amritmahal cattle'],
+    'Kangayam': ['kangeyam', 'kangayam cattle'],
+    'Hariana': ['haryana', 'haryanvi'],
+    'Khillari': ['khillar'],
+    'Tharparkar': ['thari'],
+    'Brown_Swiss': ['swiss brown'],
+    'Umblachery': ['umbalachery'],
+    'Mehsana': ['mahesana'],
+    'Crossbred': ['cross bred', 'cross breed', 'crossbreed'],
+}
+
+
+def normalize_label(label):
+    """Lower-case a label and collapse separators so 'Red-Sindhi' == 'red_sindhi'"""
+    return re.sub(r'[^a-z0-9]+', ' ', str(label).lower()).strip()
+
+
+class BreedMatcher:
+    """Alias-table lookup from raw dataset labels to target breed names"""
+
+    def __init__(self, target_breeds, aliases=None, max_ngram=3):
+        self.max_ngram = max_ngram
+        self.table: Dict[str, str] = {}
+
+        for breed in target_breeds:
+            self.table[normalize_label(breed)] = breed
+            self.table[normalize_label(breed).replace(' ', '')] = breed
+
+        for breed, names in (aliases or BREED_ALIASES).items():
+            if breed not in target_breeds:
+                continue
+            for name in names:
+                self.table.setdefault(normalize_label(name), breed)
+
+    def match(self, label) -> Optional[str]:
+        """Return the target breed for a raw label, or None if it is unknown"""
+        key = normalize_label(label)
+        if not key:
+            return None
+        if key in self.table:
+            return self.table[key]
+
+        # Fall back to word n-grams so 'Gir cow images' still resolves to Gir;
+        # longest n-gram first so 'red sindhi' wins over 'sindhi'
+        tokens = key.split()
+        for size in range(min(self.max_ngram, len(tokens)), 0, -1):
+            for start in range(len(tokens) - size + 1):
+                gram = ' '.join(tokens[start:start + size])
+                breed = self.table.get(gram) or self.table.get(gram.replace(' ', ''))
+                if breed:
+                    return breed
+        return None
+
+
+# Zip archives opened by the current (worker) process, keyed by path
+_open_archives: Dict[str, zipfile.ZipFile] = {}
+
+
+@dataclass(frozen=True)
+class ImageRecord:
+    """A single labelled image inside a raw dataset (plain file or zip member)"""
+    breed: str
+    path: str
+    member: Optional[str] = None
+    source: str = ''
+
+    @property
+    def key(self):
+        """Stable identifier used for ordering and reporting"""
+        return f"{self.path}!{self.member}" if self.member else self.path
+
+    def open(self):
+        """Return a binary file object for the image bytes"""
+        if self.member is None:
+            return open(self.path, 'rb')
+
+        archive = _open_archives.get(self.path)
+        if archive is None:
+            archive = zipfile.ZipFile(self.path, 'r')
+            _open_archives[self.path] = archive
+        return io.BytesIO(archive.read(self.member))
+
+
+def is_image_name(name):
+    return Path(name).suffix.lower() in IMAGE_EXTENSIONS
+
+
+class SourceAdapter:
+    """Base class for a raw dataset layout; subclasses yield ImageRecords"""
+
+    name = 'source'
+
+    def __init__(self, root, matcher: BreedMatcher, name=None):
+        self.root = Path(root)
+        self.matcher = matcher
+        if name:
+            self.name = name
+
+    def exists(self):
+        return self.root.exists()
+
+    def iter_records(self) -> Iterator[ImageRecord]:
+        raise NotImplementedError
+
+
+class FolderPerClassSource(SourceAdapter):
+    """Images grouped into one folder per breed, possibly nested a few levels deep"""
+
+    name = 'folder'
+
+    def iter_records(self):
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames.sort()
+            images = sorted(f for f in filenames if is_image_name(f))
+            if not images:
+                continue
+
+            breed = self.matcher.match(Path(dirpath).name)
+            if breed is None:
+                continue
+
+            for filename in images:
+                yield ImageRecord(breed, os.path.join(dirpath, filename), source=self.name)
+
+
+class CSVLabelledSource(SourceAdapter):
+    """Flat image folders with a CSV file mapping each image to its breed"""
+
+    name = 'csv'
+    path_columns = ('filename', 'file_name', 'file', 'image', 'image_path', 'path', 'image_id')
+    label_columns = ('breed', 'label', 'class', 'class_name', 'category')
+
+    def __init__(self, root, matcher, name=None, csv_path=None, path_column=None, label_column=None):
+        super().__init__(root, matcher, name)
+        self.csv_path = Path(csv_path) if csv_path else None
+        self.path_column = path_column
+        self.label_column = label_column
+
+    def find_csv(self):
+        """The explicit CSV, else the first one under root with image and label columns"""
+        if self.csv_path:
+            return self.csv_path
+        for candidate in sorted(self.root.rglob('*.csv')):
+            try:
+                with open(candidate, newline='', encoding='utf-8') as f:
+                    fieldnames = next(csv.reader(f), [])
+            except (OSError, UnicodeDecodeError):
+                continue
+            if (self._pick_column(fieldnames, self.path_column, self.path_columns)
+                    and self._pick_column(fieldnames, self.label_column, self.label_columns)):
+                return candidate
+        return None
+
+    def _pick_column(self, fieldnames, explicit, candidates):
+        if explicit:
+            return explicit
+        lowered = {name.lower().strip(): name for name in fieldnames}
+        for candidate in candidates:
+            if candidate in lowered:
+                return lowered[candidate]
+        return None
+
+    def iter_records(self):
+        csv_path = self.find_csv()
+        if csv_path is None:
+            return
+
+        # Index images by file name (and stem) once, so lookups are O(1) per row
+        by_name = {}
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                if is_image_name(filename):
+                    full_path = os.path.join(dirpath, filename)
+                    by_name.setdefault(filename, full_path)
+                    by_name.setdefault(Path(filename).stem, full_path)
+
+        with open(csv_path, newline='', encoding='utf-8') as f:
+            reader = csv.DictReader(f)
+            path_col = self._pick_column(reader.fieldnames or [], self.path_column, self.path_columns)
+            label_col = self._pick_column(reader.fieldnames or [], self.label_column, self.label_columns)
+            if path_col is None or label_col is None:
+                print(f"  {csv_path.name}: could not find image/label columns in {reader.fieldnames}")
+                return
+
+            for row in reader:
+                breed = self.matcher.match(row[label_col])
+                if breed is None:
+                    continue
+                name = Path(row[path_col].strip()).name
+                image_path = by_name.get(name) or by_name.get(Path(name).stem)
+                if image_path:
+                    yield ImageRecord(breed, image_path, source=self.name)
+
+
+class ZipSource(SourceAdapter):
+    """Folder-per-class layout read directly from a zip archive, without extracting"""
+
+    name = 'zip'
+
+    def exists(self):
+        return self.root.is_file()
+
+    def iter_records(self):
+        with zipfile.ZipFile(self.root, 'r') as archive:
+            members = sorted(m for m in archive.namelist() if is_image_name(m))
+
+        for member in members:
+            parent = Path(member).parent.name
+            breed = self.matcher.match(parent)
+            if breed is not None:
+                yield ImageRecord(breed, str(self.root), member=member, source=self.name)
+
+
+class CompositeSource(SourceAdapter):
+    """Several adapters found under one root, read as a single source"""
+
+    name = 'composite'
+
+    def __init__(self, root, sources: List[SourceAdapter], name=None):
+        super().__init__(root, None, name)
+        self.sources = sources
+
+    def iter_records(self):
+        for source in self.sources:
+            yield from source.iter_records()
+
+
+def has_class_folders(root, matcher):
+    """True if some folder under root holds images and is named after a known breed"""
+    for dirpath, _, filenames in os.walk(root):
+        if any(is_image_name(f) for f in filenames) and matcher.match(Path(dirpath).name):
+            return True
+    return False
+
+
+def detect_source(root, matcher, name=None) -> Optional[SourceAdapter]:
+    """Pick the adapter(s) matching the layout found at root.
+
+    Breed folders win over CSV files, since folder-per-class datasets often
+    ship a metadata CSV; a CSV is only used when it has image and label
+    columns. Every zip archive directly under root is read as well.
+    """
+    root = Path(root)
+    if root.is_file() and zipfile.is_zipfile(root):
+        return ZipSource(root, matcher, name)
+    if not root.is_dir():
+        return None
+
+    sources = []
+    if has_class_folders(root, matcher):
+        sources.append(FolderPerClassSource(root, matcher, name))
+    else:
+        csv_source = CSVLabelledSource(root, matcher, name)
+        if csv_source.find_csv():
+            sources.append(csv_source)
+    sources += [ZipSource(path, matcher, name) for path in sorted(root.glob('*.zip'))]
+
+    if not sources:
+        return FolderPerClassSource(root, matcher, name)
+    if len(sources) == 1:
+        return sources[0]
+    return CompositeSource(root, sources, name)
+
+
+def iter_all_records(sources: List[SourceAdapter]) -> Iterator[ImageRecord]:
+    """Chain records from every available source into one stream"""
+    for source in sources:
+        if not source.exists():
+            print(f"{source.name}: dataset not found at {source.root}, skipping")
+            continue
+        print(f"Reading {source.name} ({type(source).__name__}) from {source.root}...")
+        yield from source.iter_records()
@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""
+Embedding Index for Visual Similar-Breed Search
+Builds a compact IVF-PQ (inverted file + product quantization) index over
+penultimate-layer embeddings of the reference images, using only NumPy
+"""
+
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+
+INDEX_FILE = 'embedding_index.npz'
+METADATA_FILE = 'embedding_index.json'
+
+
+def _squared_distances(x, centroids):
+    """Pairwise squared L2 distances between rows of x and centroids"""
+    return (
+        np.sum(x * x, axis=1, keepdims=True)
+        - 2.0 * x @ centroids.T
+        + np.sum(centroids * centroids, axis=1)
+    )
+
+
+def kmeans(x, k, n_iter=20, seed=42):
+    """Plain Lloyd's k-means; returns (centroids, assignments)"""
+    rng = np.random.default_rng(seed)
+    x = np.asarray(x, dtype=np.float32)
+    k = min(k, len(x))
+    centroids = x[rng.choice(len(x), size=k, replace=False)].copy()
+
+    for _ in range(n_iter):
+        assignments = np.argmin(_squared_distances(x, centroids), axis=1)
+        counts = np.bincount(assignments, minlength=k)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, x)
+
+        empty = counts == 0
+        centroids[~empty] = sums[~empty] / counts[~empty, None]
+        # Re-seed empty clusters from random points so k stays constant
+        if empty.any():
+            centroids[empty] = x[rng.choice(len(x), size=int(empty.sum()), replace=False)]
+
+    assignments = np.argmin(_squared_distances(x, centroids), axis=1)
+    return centroids, assignments
+
+
+class IVFPQIndex:
+    """Approximate nearest-neighbour index over L2-normalised embeddings.
+
+    Vectors are assigned to one of n_lists coarse centroids and the residual is
+    product-quantized into n_subvectors uint8 codes. Queries scan only the
+    n_probe closest lists using asymmetric distance lookup tables.
+
+    Search uses the IVFADC decomposition of ||q - c - y||^2 into
+    ||q - c||^2 (the coarse distance), ||y||^2 + 2<c, y> (per list, computed
+    once at fit/load time, n_lists * n_subvectors * n_codewords floats) and
+    -2<q, y> (one table per query, shared by every probed list).
+    """
+
+    def __init__(self, n_lists=128, n_subvectors=32, n_bits=8, n_probe=8):
+        if n_bits > 8:
+            raise ValueError("n_bits must be <= 8 (codes are stored as uint8)")
+        self.n_lists = n_lists
+        self.n_subvectors = n_subvectors
+        self.n_codewords = 2 ** n_bits
+        self.n_probe = n_probe
+
+        self.coarse_centroids = None   # (n_lists, dim)
+        self.codebooks = None          # (n_subvectors, n_codewords, sub_dim)
+        self.codes = None              # (n, n_subvectors) uint8, grouped by list
+        self.ids = None                # (n,) original row ids, grouped by list
+        self.list_offsets = None       # (n_lists + 1,) start of each list in codes/ids
+        self.list_tables = None        # (n_lists, n_subvectors, n_codewords) query-independent terms
+
+    @staticmethod
+    def normalize(vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    @property
+    def dim(self):
+        return self.coarse_centroids.shape[1]
+
+    def _split(self, vectors):
+        return vectors.reshape(len(vectors), self.n_subvectors, -1)
+
+    def fit(self, vectors, n_iter=20, seed=42):
+        """Train coarse and PQ codebooks on vectors and index all of them"""
+        vectors = self.normalize(vectors)
+        if vectors.shape[1] % self.n_subvectors:
+            raise ValueError(
+                f"Embedding dim {vectors.shape[1]} is not divisible by n_subvectors={self.n_subvectors}"
+            )
+
+        self.coarse_centroids, assignments = kmeans(vectors, self.n_lists, n_iter, seed)
+        self.n_lists = len(self.coarse_centroids)
+        residuals = self._split(vectors - self.coarse_centroids[assignments])
+
+        codebooks = []
+        for m in range(self.n_subvectors):
+            centroids, _ = kmeans(residuals[:, m], self.n_codewords, n_iter, seed + m)
+            if len(centroids) < self.n_codewords:
+                pad = np.repeat(centroids[-1:], self.n_codewords - len(centroids), axis=0)
+                centroids = np.vstack([centroids, pad])
+            codebooks.append(centroids)
+        self.codebooks = np.stack(codebooks).astype(np.float32)
+
+        self._build_lists(residuals, assignments)
+        self._precompute_tables()
+        return self
+
+    def _precompute_tables(self):
+        """||y||^2 + 2<c, y> for every list centroid c and codeword y, per sub-space"""
+        centroids = self._split(self.coarse_centroids)  # (n_lists, n_subvectors, sub_dim)
+        norms = np.sum(self.codebooks ** 2, axis=2)      # (n_subvectors, n_codewords)
+        cross = np.einsum('lmd,mkd->lmk', centroids, self.codebooks)
+        self.list_tables = (norms + 2.0 * cross).astype(np.float32)
+
+    def _encode(self, residuals):
+        codes = np.empty((len(residuals), self.n_subvectors), dtype=np.uint8)
+        for m in range(self.n_subvectors):
+            codes[:, m] = np.argmin(_squared_distances(residuals[:, m], self.codebooks[m]), axis=1)
+        return codes
+
+    def _build_lists(self, residuals, assignments):
+        order = np.argsort(assignments, kind='stable')
+        self.codes = self._encode(residuals[order])
+        self.ids = order.astype(np.int64)
+        counts = np.bincount(assignments, minlength=self.n_lists)
+        self.list_offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+    def search(self, query, k=10, n_probe=None):
+        """Return (ids, distances) of the approximate k nearest indexed vectors"""
+        query = self.normalize(query).reshape(-1)
+        n_probe = min(n_probe or self.n_probe, self.n_lists)
+
+        coarse = np.sum((self.coarse_centroids - query) ** 2, axis=1)
+        probe_lists = np.argpartition(coarse, n_probe - 1)[:n_probe]
+
+        starts = self.list_offsets[probe_lists]
+        counts = self.list_offsets[probe_lists + 1] - starts
+        total = int(counts.sum())
+        if not total:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        # Rows of every probed list, and each row's position in probe_lists
+        rows = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(total)
+        row_probe = np.repeat(np.arange(len(probe_lists)), counts)
+
+        # One (n_subvectors, n_codewords) table per probed list, then one flat gather
+        query_table = -2.0 * np.matmul(self.codebooks, self._split(query[None])[0][..., None])[..., 0]
+        tables = (self.list_tables[probe_lists] + query_table).reshape(-1)
+        sub_offsets = np.arange(self.n_subvectors) * self.n_codewords
+        flat = (row_probe[:, None] * self.n_subvectors * self.n_codewords + sub_offsets) + self.codes[rows]
+        dists = coarse[probe_lists][row_probe] + tables[flat].sum(axis=1)
+        ids = self.ids[rows]
+        k = min(k, len(ids))
+        top = np.argpartition(dists, k - 1)[:k]
+        top = top[np.argsort(dists[top])]
+        return ids[top], dists[top]
+
+    def save(self, path):
+        np.savez_compressed(
+            path,
+            coarse_centroids=self.coarse_centroids.astype(np.float16),
+            codebooks=self.codebooks.astype(np.float16),
+            codes=self.codes,
+            ids=self.ids.astype(np.int32),
+            list_offsets=self.list_offsets.astype(np.int32),
+            n_probe=np.int32(self.n_probe)
+        )
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        index = cls(
+            n_lists=len(data['coarse_centroids']),
+            n_subvectors=data['codebooks'].shape[0],
+            n_bits=int(np.log2(data['codebooks'].shape[1])),
+            n_probe=int(data['n_probe'])
+        )
+        index.coarse_centroids = data['coarse_centroids'].astype(np.float32)
+        index.codebooks = data['codebooks'].astype(np.float32)
+        index.codes = data['codes']
+        index.ids = data['ids'].astype(np.int64)
+        index.list_offsets = data['list_offsets'].astype(np.int64)
+        index._precompute_tables()
+        return index
+
+
+class SimilarBreedSearch:
+    """Query API: embeddings or images in, similar reference images out"""
+
+    def __init__(self, index_dir, model=None, image_size=(224, 224)):
+        index_dir = Path(index_dir)
+        self.index = IVFPQIndex.load(index_dir / INDEX_FILE)
+        with open(index_dir / METADATA_FILE) as f:
+            self.metadata = json.load(f)
+        self.embedder = make_embedding_model(model) if model is not None else None
+        self.image_size = image_size
+
+    def query_embedding(self, embedding, k=10, n_probe=None):
+        ids, dists = self.index.search(embedding, k=k, n_probe=n_probe)
+        return [
+            {
+                'image': self.metadata['images'][i],
+                'breed': self.metadata['breeds'][i],
+                'distance': float(d)
+            }
+            for i, d in zip(ids, dists)
+        ]
+
+    def query_image(self, image_path, k=10, n_probe=None):
+        if self.embedder is None:
+            raise ValueError("SimilarBreedSearch needs a model to embed raw images")
+        embedding = embed_images(self.embedder, [image_path], self.image_size)[0]
+        return self.query_embedding(embedding, k=k, n_probe=n_probe)
+
+
+def make_embedding_model(model, layer_name='predictions'):
+    """Sub-model returning the input of the classifier layer (penultimate features)"""
+    from tensorflow import keras
+    layer_names = {layer.name for layer in model.layers}
+    if 'features_pool' in layer_names:
+        # Hierarchical model: pooled backbone features shared by both breed heads
+        return keras.Model(model.inputs, model.get_layer('features_pool').output)
+    return keras.Model(model.inputs, model.get_layer(layer_name).input)
+
+
+def embed_images(embedder, image_paths, image_size=(224, 224), batch_size=64):
+    """Run images through the embedding model in batches"""
+    from tensorflow.keras.preprocessing.image import img_to_array, load_img
+
+    embeddings = []
+    for start in range(0, len(image_paths), batch_size):
+        # Raw uint8 pixels, exactly what the training generators feed the model
+        batch = np.stack([
+            img_to_array(load_img(path, target_size=image_size), dtype='uint8')
+            for path in image_paths[start:start + batch_size]
+        ])
+        embeddings.append(embedder.predict(batch, verbose=0))
+    return np.concatenate(embeddings).astype(np.float32)
+
+
+def benchmark_recall(index, vectors, k=10, n_queries=500, n_probe_values=(1, 4, 8, 16), seed=0):
+    """Recall@k against exact brute-force search, plus mean query latency"""
+    vectors = IVFPQIndex.normalize(vectors)
+    rng = np.random.default_rng(seed)
+    query_ids = rng.choice(len(vectors), size=min(n_queries, len(vectors)), replace=False)
+
+    exact = {}
+    for qid in query_ids:
+        dists = np.sum((vectors - vectors[qid]) ** 2, axis=1)
+        exact[qid] = set(np.argpartition(dists, k - 1)[:k].tolist())
+
+    results = []
+    for n_probe in n_probe_values:
+        hits = 0
+        start = time.perf_counter()
+        for qid in query_ids:
+            ids, _ = index.search(vectors[qid], k=k, n_probe=n_probe)
+            hits += len(exact[qid].intersection(ids.tolist()))
+        elapsed = time.perf_counter() - start
+        results.append({
+            'n_probe': n_probe,
+            'recall_at_k': hits / (k * len(query_ids)),
+            'mean_latency_ms': elapsed / len(query_ids) * 1000
+        })
+    return {'k': k, 'n_queries': len(query_ids), 'num_vectors': len(vectors), 'results': results}
+
+
+def build_reference_index(model, processed_dir, output_dir, image_size=(224, 224),
+                          n_lists=None, n_subvectors=32, n_probe=8):
+    """Embed every processed reference image and write the index to output_dir.
+
+    The .npz is read by SimilarBreedSearch in Python, not by the browser, so
+    output_dir should not be the served tfjs model folder.
+    """
+    processed_dir = Path(processed_dir)
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    image_paths, breeds = [], []
+    for split in ['train', 'validation', 'test']:
+        for breed_dir in sorted((processed_dir / split).glob('*')):
+            if breed_dir.is_dir():
+                for image_path in sorted(breed_dir.glob('*.jpg')):
+                    image_paths.append(str(image_path))
+                    breeds.append(breed_dir.name)
+
+    if not image_paths:
+        raise ValueError(f"No reference images found under {processed_dir}")
+
+    print(f"Embedding {len(image_paths)} reference images...")
+    embedder = make_embedding_model(model)
+    vectors = embed_images(embedder, image_paths, image_size)
+
+    # ~sqrt(N) inverted lists keeps both coarse and list scans small
+    n_lists = n_lists or max(1, int(np.sqrt(len(vectors))))
+    print(f"Building IVF-PQ index ({n_lists} lists, {n_subvectors} sub-vectors)...")
+    index = IVFPQIndex(n_lists=n_lists, n_subvectors=n_subvectors, n_probe=n_probe).fit(vectors)
+    index.save(output_dir / INDEX_FILE)
+
+    benchmark = benchmark_recall(index, vectors)
+    metadata = {
+        'images': [str(Path(p).relative_to(processed_dir)) for p in image_paths],
+        'breeds': breeds,
+        'embedding_dim': int(vectors.shape[1]),
+        'n_lists': index.n_lists,
+        'n_subvectors': index.n_subvectors,
+        'benchmark': benchmark
+    }
+    with open(output_dir / METADATA_FILE, 'w') as f:
+        json.dump(metadata, f)
+
+    for row in benchmark['results']:
+        print(f"  n_probe={row['n_probe']:>3}: recall@{benchmark['k']}={row['recall_at_k']:.3f}, "
+              f"{row['mean_latency_ms']:.3f} ms/query")
+    print(f"Embedding index saved to {output_dir}/{INDEX_FILE}")
+
+    return index, benchmark
+
+
+def main():
+    """Build the similar-breed index from the best trained checkpoint"""
+    from tensorflow import keras
+    from train_model import CONFIG
+
+    model = keras.models.load_model(f"models/{CONFIG['model_name']}_best.h5")
+    build_reference_index(model, 'data/processed', CONFIG['embedding_index_dir'], CONFIG['image_size'])
+
+
+if __name__ == "__main__":
+    main()
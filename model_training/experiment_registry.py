@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+Local Experiment Registry for Cattle Breed Identification
+Records every training run (config, dataset manifest hash, per-epoch metrics,
+per-phase timings, peak memory, export sizes and artifacts) in SQLite plus a
+run directory, and compares runs from the command line
+"""
+
+import argparse
+import hashlib
+import json
+import shutil
+import sqlite3
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+from resource_monitor import PeakRSSSampler, max_rss_bytes
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    name TEXT,
+    started_at REAL,
+    finished_at REAL,
+    status TEXT,
+    config_json TEXT,
+    dataset_hash TEXT,
+    dataset_images INTEGER,
+    run_dir TEXT
+);
+CREATE TABLE IF NOT EXISTS epochs (
+    run_id TEXT,
+    phase TEXT,
+    epoch INTEGER,
+    seconds REAL,
+    images_per_sec REAL,
+    metrics_json TEXT
+);
+CREATE TABLE IF NOT EXISTS phases (
+    run_id TEXT,
+    phase TEXT,
+    seconds REAL,
+    images INTEGER,
+    images_per_sec REAL,
+    peak_rss_mb REAL
+);
+CREATE TABLE IF NOT EXISTS metrics (
+    run_id TEXT,
+    key TEXT,
+    value REAL,
+    PRIMARY KEY (run_id, key)
+);
+CREATE TABLE IF NOT EXISTS artifacts (
+    run_id TEXT,
+    name TEXT,
+    path TEXT,
+    bytes INTEGER
+);
+"""
+
+
+def _path_size(path):
+    path = Path(path)
+    if path.is_dir():
+        return sum(p.stat().st_size for p in path.rglob('*') if p.is_file())
+    return path.stat().st_size if path.exists() else 0
+
+
+def dataset_manifest(dataset_dir, extensions=('.jpg', '.jpeg', '.png')):
+    """Sorted (relative path, size) list of every image plus its SHA-256"""
+    dataset_dir = Path(dataset_dir)
+    entries = sorted(
+        (str(p.relative_to(dataset_dir)), p.stat().st_size)
+        for p in dataset_dir.rglob('*')
+        if p.suffix.lower() in extensions
+    )
+    digest = hashlib.sha256(json.dumps(entries).encode()).hexdigest()
+    return entries, digest
+
+
+class ExperimentRegistry:
+    """SQLite index at <root>/registry.db with one directory per run under <root>/runs/"""
+
+    def __init__(self, root='experiments'):
+        self.root = Path(root)
+        self.runs_dir = self.root / 'runs'
+        self.runs_dir.mkdir(parents=True, exist_ok=True)
+        self.db_path = self.root / 'registry.db'
+        with self.connect() as db:
+            db.executescript(SCHEMA)
+
+    @contextmanager
+    def connect(self):
+        db = sqlite3.connect(self.db_path)
+        db.row_factory = sqlite3.Row
+        try:
+            yield db
+            db.commit()
+        finally:
+            db.close()
+
+    def start_run(self, config, dataset_dir='data/processed', name=None):
+        run_id = time.strftime('%Y%m%d-%H%M%S-') + uuid.uuid4().hex[:6]
+        run_dir = self.runs_dir / run_id
+        run_dir.mkdir(parents=True)
+
+        entries, digest = dataset_manifest(dataset_dir)
+        with open(run_dir / 'dataset_manifest.json', 'w') as f:
+            json.dump({'hash': digest, 'files': entries}, f)
+        with open(run_dir / 'config.json', 'w') as f:
+            json.dump(config, f, indent=2, default=str)
+
+        with self.connect() as db:
+            db.execute(
+                "INSERT INTO runs VALUES (?, ?, ?, NULL, 'running', ?, ?, ?, ?)",
+                (run_id, name or config.get('model_name'), time.time(),
+                 json.dumps(config, default=str), digest, len(entries), str(run_dir))
+            )
+        print(f"Experiment run {run_id} (dataset {digest[:12]}, {len(entries)} images)")
+        return ExperimentRun(self, run_id, run_dir)
+
+    def list_runs(self, limit=20):
+        with self.connect() as db:
+            return [dict(r) for r in db.execute(
+                "SELECT run_id, name, status, started_at, finished_at, dataset_hash, dataset_images "
+                "FROM runs ORDER BY started_at DESC LIMIT ?", (limit,)
+            )]
+
+    def run_summary(self, run_id):
+        with self.connect() as db:
+            run = db.execute("SELECT * FROM runs WHERE run_id LIKE ?", (run_id + '%',)).fetchone()
+            if run is None:
+                raise KeyError(f"No run matching {run_id}")
+            run_id = run['run_id']
+            return {
+                'run': dict(run),
+                'metrics': {r['key']: r['value'] for r in db.execute(
+                    "SELECT key, value FROM metrics WHERE run_id = ?", (run_id,))},
+                'phases': [dict(r) for r in db.execute(
+                    "SELECT phase, seconds, images, images_per_sec, peak_rss_mb FROM phases "
+                    "WHERE run_id = ? ORDER BY rowid", (run_id,))],
+                'artifacts': [dict(r) for r in db.execute(
+                    "SELECT name, path, bytes FROM artifacts WHERE run_id = ?", (run_id,))],
+                'epochs': [dict(r) for r in db.execute(
+                    "SELECT phase, epoch, seconds, images_per_sec, metrics_json FROM epochs "
+                    "WHERE run_id = ? ORDER BY rowid", (run_id,))]
+            }
+
+    def trend(self, key):
+        """(started_at, run_id, value) of one summary metric across finished runs"""
+        with self.connect() as db:
+            return [tuple(r) for r in db.execute(
+                "SELECT runs.started_at, runs.run_id, metrics.value FROM metrics "
+                "JOIN runs USING (run_id) WHERE metrics.key = ? ORDER BY runs.started_at", (key,)
+            )]
+
+
+class ExperimentRun:
+    """Handle for an in-progress run; all writes go straight to SQLite"""
+
+    def __init__(self, registry, run_id, run_dir):
+        self.registry = registry
+        self.run_id = run_id
+        self.run_dir = Path(run_dir)
+
+    def log_epoch(self, phase, epoch, seconds, images_per_sec, metrics):
+        with self.registry.connect() as db:
+            db.execute("INSERT INTO epochs VALUES (?, ?, ?, ?, ?, ?)",
+                       (self.run_id, phase, epoch, seconds, images_per_sec,
+                        json.dumps({k: float(v) for k, v in metrics.items()})))
+
+    def log_metrics(self, metrics):
+        with self.registry.connect() as db:
+            db.executemany("INSERT OR REPLACE INTO metrics VALUES (?, ?, ?)",
+                           [(self.run_id, k, float(v)) for k, v in metrics.items() if v is not None])
+
+    def log_artifact(self, name, path, snapshot=False):
+        """Record an artifact's path and size; snapshot=True also copies it into the run dir"""
+        path = Path(path)
+        if snapshot and path.exists():
+            dest = self.run_dir / 'artifacts' / path.name
+            dest.parent.mkdir(exist_ok=True)
+            if path.is_dir():
+                shutil.copytree(path, dest, dirs_exist_ok=True)
+            else:
+                shutil.copy2(path, dest)
+            path = dest
+        with self.registry.connect() as db:
+            db.execute("INSERT INTO artifacts VALUES (?, ?, ?, ?)",
+                       (self.run_id, name, str(path), _path_size(path)))
+
+    @contextmanager
+    def phase(self, name, images=None):
+        """Time a phase and record its throughput and peak RSS.
+
+        Yields a dict; set stats['images'] inside the block when the image
+        count is only known after the phase has run.
+        """
+        stats = {'images': images}
+        start = time.perf_counter()
+        with PeakRSSSampler() as sampler:
+            yield stats
+        seconds = time.perf_counter() - start
+        images = stats['images']
+        with self.registry.connect() as db:
+            db.execute("INSERT INTO phases VALUES (?, ?, ?, ?, ?, ?)",
+                       (self.run_id, name, seconds, images,
+                        images / seconds if images and seconds else None,
+                        sampler.peak_rss / 1e6))
+
+    def keras_callback(self, phase, batch_size):
+        """Keras callback logging per-epoch metrics, wall time and images/sec"""
+        from tensorflow import keras
+        run = self
+
+        class RegistryCallback(keras.callbacks.Callback):
+            def on_epoch_begin(self, epoch, logs=None):
+                self._start = time.perf_counter()
+
+            def on_epoch_end(self, epoch, logs=None):
+                seconds = time.perf_counter() - self._start
+                images = (self.params.get('steps') or 0) * batch_size
+                run.log_epoch(phase, epoch, seconds, images / seconds if seconds else None, logs or {})
+
+        return RegistryCallback()
+
+    def finish(self, status='completed', metrics=None):
+        metrics = dict(metrics or {})
+        metrics.setdefault('max_rss_mb', max_rss_bytes() / 1e6)
+        self.log_metrics(metrics)
+        with self.registry.connect() as db:
+            db.execute("UPDATE runs SET status = ?, finished_at = ? WHERE run_id = ?",
+                       (status, time.time(), self.run_id))
+        print(f"Experiment run {self.run_id} {status}; details in {self.run_dir}")
+
+
+def _format_time(timestamp):
+    return time.strftime('%Y-%m-%d %H:%M', time.localtime(timestamp)) if timestamp else '-'
+
+
+def compare_runs(registry, run_ids):
+    """Side-by-side table of summary metrics and phase timings"""
+    summaries = [registry.run_summary(r) for r in run_ids]
+    ids = [s['run']['run_id'] for s in summaries]
+
+    keys = sorted({k for s in summaries for k in s['metrics']})
+    phases = list(dict.fromkeys(p['phase'] for s in summaries for p in s['phases']))
+
+    width = max(24, *(len(k) + 2 for k in keys)) if keys else 24
+    print(f"{'':<{width}}" + ''.join(f"{i[:22]:>24}" for i in ids))
+    print(f"{'dataset':<{width}}" + ''.join(f"{s['run']['dataset_hash'][:12]:>24}" for s in summaries))
+    for key in keys:
+        values = [s['metrics'].get(key) for s in summaries]
+        print(f"{key:<{width}}" + ''.join(f"{v:>24.4f}" if v is not None else f"{'-':>24}" for v in values))
+    for phase in phases:
+        cells = []
+        for s in summaries:
+            row = next((p for p in s['phases'] if p['phase'] == phase), None)
+            if row is None:
+                cells.append(f"{'-':>24}")
+            else:
+                rate = f" {row['images_per_sec']:.0f}/s" if row['images_per_sec'] else ''
+                cells.append(f"{row['seconds']:.0f}s{rate}".rjust(24))
+        print(f"{'phase ' + phase:<{width}}" + ''.join(cells))
+
+
+def main():
+    """Command-line interface: list, show, compare and trend"""
+    parser = argparse.ArgumentParser(description="Query the local experiment registry")
+    parser.add_argument('--root', default='experiments')
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('list').add_argument('--limit', type=int, default=20)
+    sub.add_parser('show').add_argument('run_id')
+    sub.add_parser('compare').add_argument('run_ids', nargs='+')
+    sub.add_parser('trend').add_argument('metric')
+    args = parser.parse_args()
+
+    registry = ExperimentRegistry(args.root)
+
+    if args.command == 'list':
+        for run in registry.list_runs(args.limit):
+            print(f"{run['run_id']:<26} {run['status']:<10} {_format_time(run['started_at'])}  "
+                  f"{run['dataset_images'] or 0:>7} images  dataset {run['dataset_hash'][:12]}  {run['name']}")
+    elif args.command == 'show':
+        print(json.dumps(registry.run_summary(args.run_id), indent=2, default=str))
+    elif args.command == 'compare':
+        compare_runs(registry, args.run_ids)
+    elif args.command == 'trend':
+        for started_at, run_id, value in registry.trend(args.metric):
+            print(f"{_format_time(started_at)}  {run_id:<26} {value:.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Gradual Fine-Tuning Schedule for Cattle Breed Identification
+Unfreezes EfficientNet blocks from the top down in stages, keeping
+BatchNormalization frozen, and reports the cost of every stage
+"""
+
+import re
+import time
+
+import numpy as np
+from tensorflow import keras
+
+# EfficientNet layer names start with stem_, block<N><letter>_ or top_
+_BACKBONE_LAYER = re.compile(r'^(stem|block(\d)[a-z]|top)_')
+
+# Default schedule: 20 fine-tune epochs, like the previous single full unfreeze
+DEFAULT_FINE_TUNE_SCHEDULE = [
+    {'blocks': 2, 'epochs': 5},
+    {'blocks': 4, 'epochs': 5},
+    {'blocks': 7, 'epochs': 10}
+]
+
+
+def backbone_group(layer_name):
+    """0 for the stem, 1-7 for EfficientNet blocks, 8 for the top conv; None otherwise"""
+    match = _BACKBONE_LAYER.match(layer_name)
+    if not match:
+        return None
+    if match.group(1) == 'stem':
+        return 0
+    if match.group(1) == 'top':
+        return 8
+    return int(match.group(2))
+
+
+def backbone_layers(model):
+    """Backbone layers of a flat (nested EfficientNet) or hierarchical (inlined) model"""
+    for layer in model.layers:
+        if layer.name.startswith('efficientnet') and hasattr(layer, 'layers'):
+            # Nested backbones must be trainable themselves for sublayer flags to matter
+            layer.trainable = True
+            yield from layer.layers
+        elif backbone_group(layer.name) is not None:
+            yield layer
+
+
+def unfreeze_top_blocks(model, n_blocks):
+    """Make the top n_blocks EfficientNet blocks (plus top conv) trainable; BN stays frozen"""
+    cutoff = 8 - n_blocks
+    for layer in backbone_layers(model):
+        group = backbone_group(layer.name)
+        if group is None:
+            continue
+        layer.trainable = (
+            group >= cutoff
+            and not isinstance(layer, keras.layers.BatchNormalization)
+        )
+
+
+def count_trainable_params(model):
+    return int(sum(np.prod(w.shape) for w in model.trainable_weights))
+
+
+class StepTimeCallback(keras.callbacks.Callback):
+    """Collects wall time of every training step"""
+
+    def __init__(self):
+        super().__init__()
+        self.step_times = []
+
+    def on_train_batch_begin(self, batch, logs=None):
+        self._start = time.perf_counter()
+
+    def on_train_batch_end(self, batch, logs=None):
+        self.step_times.append(time.perf_counter() - self._start)
+
+    def mean_step_ms(self, skip=2):
+        # The first steps of a freshly compiled model include tracing
+        times = self.step_times[skip:] or self.step_times
+        return float(np.mean(times) * 1000) if times else None
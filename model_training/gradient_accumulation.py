@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Gradient Accumulation for Cattle Breed Identification
+Trains on small micro-batches but applies one optimizer update per
+accumulation_steps micro-batches, so peak memory follows the micro-batch
+size while updates match the full batch
+"""
+
+import argparse
+import json
+from pathlib import Path
+
+import tensorflow as tf
+from tensorflow import keras
+
+from resource_monitor import max_rss_bytes, run_in_fresh_process
+
+
+class _AccumulationState:
+    """Plain holder for the accumulators; Keras tracks variables set on a Model
+    as weights, which would put them in every checkpoint and count_params()"""
+
+    def __init__(self, variables):
+        self.accumulators = [
+            tf.Variable(tf.zeros_like(v), trainable=False, name=f"accum_{i}")
+            for i, v in enumerate(variables)
+        ]
+        self.micro_step = tf.Variable(0, trainable=False, dtype=tf.int64, name='micro_step')
+
+
+@keras.utils.register_keras_serializable(package='bharat_pashudhan')
+class GradientAccumulationModel(keras.Model):
+    """Functional model whose train_step averages gradients over several micro-batches.
+
+    Gradients are summed into accumulators kept outside the model's weights
+    and applied once every accumulation_steps steps, scaled so the update
+    equals the mean over the full effective batch. Accumulators are rebuilt
+    on every compile(), which the trainer already calls whenever trainable
+    flags change. Gradients left over at the end of an epoch carry into the
+    next one. save() (and so ModelCheckpoint) writes the plain functional
+    model, which keras.models.load_model reads without this class.
+    """
+
+    def __init__(self, *args, accumulation_steps=1, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.accumulation_steps = accumulation_steps
+        self._state = None
+
+    @classmethod
+    def wrap(cls, model, accumulation_steps):
+        return cls(inputs=model.inputs, outputs=model.outputs, name=model.name,
+                   accumulation_steps=accumulation_steps)
+
+    def save(self, filepath, *args, **kwargs):
+        keras.Model(self.inputs, self.outputs, name=self.name).save(filepath, *args, **kwargs)
+
+    def compile(self, *args, **kwargs):
+        super().compile(*args, **kwargs)
+        self._state = _AccumulationState(self.trainable_variables)
+        # Create optimizer slots eagerly; they can't be created inside tf.cond
+        if hasattr(self.optimizer, 'build'):
+            self.optimizer.build(self.trainable_variables)
+
+    def train_step(self, data):
+        x, y, sample_weight = keras.utils.unpack_x_y_sample_weight(data)
+
+        with tf.GradientTape() as tape:
+            y_pred = self(x, training=True)
+            loss = self.compute_loss(x, y, y_pred, sample_weight)
+            scaled_loss = loss / self.accumulation_steps
+
+        gradients = tape.gradient(scaled_loss, self.trainable_variables)
+        state = self._state
+        for accumulator, gradient in zip(state.accumulators, gradients):
+            if gradient is not None:
+                accumulator.assign_add(gradient)
+        state.micro_step.assign_add(1)
+
+        def apply_and_reset():
+            self.optimizer.apply_gradients(zip(state.accumulators, self.trainable_variables))
+            for accumulator in state.accumulators:
+                accumulator.assign(tf.zeros_like(accumulator))
+            return tf.constant(True)
+
+        tf.cond(
+            state.micro_step % self.accumulation_steps == 0,
+            apply_and_reset,
+            lambda: tf.constant(False)
+        )
+
+        return self.compute_metrics(x, y, y_pred, sample_weight)
+
+
+def _measure_setting(config, data_dir, steps, queue):
+    """Child process: run a few full fine-tune steps and report peak RSS"""
+    from fine_tuning import unfreeze_top_blocks
+    from train_model import CattleBreedTrainer
+
+    trainer = CattleBreedTrainer(config)
+    train_gen, _ = trainer.preprocess_images(data_dir)
+    config['num_classes'] = len(trainer.class_names)
+    model = trainer.create_model()
+    # Worst case for memory: the whole backbone trainable
+    unfreeze_top_blocks(model, 8)
+    trainer.compile_model(model, config['learning_rate'] / 10)
+    model.fit(train_gen, steps_per_epoch=min(steps, len(train_gen)), epochs=1, verbose=0)
+    queue.put(max_rss_bytes())
+
+
+def compare_peak_rss(base_config, data_dir, batch_size, micro_batch_sizes, steps=10, timeout=1800):
+    """Peak RSS per micro-batch size at the same effective batch, each in a fresh process.
+
+    Raises RuntimeError if a child fails (e.g. MissingWeightsError with an
+    empty weight store) and TimeoutError after timeout seconds per setting.
+    """
+    results = []
+
+    for micro_batch_size in micro_batch_sizes:
+        if batch_size % micro_batch_size:
+            raise ValueError(f"micro batch {micro_batch_size} does not divide batch size {batch_size}")
+        config = {
+            **base_config,
+            'batch_size': batch_size,
+            'micro_batch_size': micro_batch_size,
+            'accumulation_steps': batch_size // micro_batch_size
+        }
+        peak = run_in_fresh_process(
+            _measure_setting, (config, data_dir, steps * config['accumulation_steps']), timeout=timeout
+        )
+
+        results.append({
+            'batch_size': batch_size,
+            'micro_batch_size': micro_batch_size,
+            'accumulation_steps': config['accumulation_steps'],
+            'optimizer_steps': steps,
+            'peak_rss_mb': peak / 1e6
+        })
+        print(f"  micro batch {micro_batch_size:>3} x {config['accumulation_steps']:>2} steps: "
+              f"peak RSS {peak / 1e6:.0f} MB")
+
+    return results
+
+
+def main():
+    """Compare peak RSS of full-batch and accumulated training"""
+    from train_model import CONFIG
+
+    parser = argparse.ArgumentParser(description="Measure peak RSS with gradient accumulation")
+    parser.add_argument('--data-dir', default='data/processed/train')
+    parser.add_argument('--batch-size', type=int, default=CONFIG['batch_size'])
+    parser.add_argument('--micro-batch-sizes', type=int, nargs='+', default=[32, 8])
+    parser.add_argument('--steps', type=int, default=10, help="Optimizer steps per setting")
+    parser.add_argument('--output', default='results/accumulation_memory.json')
+    args = parser.parse_args()
+
+    results = compare_peak_rss(CONFIG, args.data_dir, args.batch_size, args.micro_batch_sizes, args.steps)
+
+    Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
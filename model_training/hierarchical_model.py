@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Hierarchical Cattle/Buffalo Model for Cattle Breed Identification
+A cheap species gate on an intermediate EfficientNet block routes each image
+to a cattle-only or buffalo-only breed head, with an early exit that returns
+only the species for images the gate is very unsure about
+"""
+
+import time
+
+import numpy as np
+from tensorflow import keras
+from tensorflow.keras import layers
+from tensorflow.keras.applications import EfficientNetB0
+
+from model_profiling import count_flops, measure_latency
+
+SPECIES = ['cattle', 'buffalo']
+
+
+def species_index(class_names, breed_classes):
+    """Per-species lists of positions in class_names, in SPECIES order"""
+    return [
+        [i for i, name in enumerate(class_names) if name in set(breed_classes[species])]
+        for species in SPECIES
+    ]
+
+
+def species_matrix(class_names, breed_classes):
+    """(num_classes, 2) one-hot matrix mapping breed labels to species labels"""
+    matrix = np.zeros((len(class_names), len(SPECIES)), dtype=np.float32)
+    for s, indices in enumerate(species_index(class_names, breed_classes)):
+        matrix[indices, s] = 1.0
+    return matrix
+
+
+def _breed_head(features, num_classes, name):
+    x = layers.Dropout(0.3, name=f'{name}_dropout_1')(features)
+    x = layers.Dense(256, activation='relu', name=f'{name}_dense')(x)
+    x = layers.BatchNormalization(name=f'{name}_bn')(x)
+    x = layers.Dropout(0.3, name=f'{name}_dropout_2')(x)
+    return layers.Dense(num_classes, activation='softmax', name=name)(x)
+
+
+def create_hierarchical_model(config, class_names, breed_classes, input_dtype='uint8', weights='imagenet'):
+    """Species gate + per-species heads; outputs [flat predictions, species]"""
+    groups = species_index(class_names, breed_classes)
+
+    inputs = keras.Input(shape=(*config['image_size'], 3), dtype=input_dtype, name='image')
+    # Raw pixels in; EfficientNet normalizes 0-255 input itself, so only cast
+    pixels = layers.Rescaling(1.0, name='pixel_cast')(inputs)
+    base_model = EfficientNetB0(weights=weights, include_top=False, input_tensor=pixels)
+    base_model.trainable = False
+
+    # Cheap gate on an intermediate block, so an early exit skips the top of the backbone
+    gate_features = base_model.get_layer(config['gate_layer']).output
+    gate = layers.GlobalAveragePooling2D(name='gate_pool')(gate_features)
+    gate = layers.Dense(64, activation='relu', name='gate_dense')(gate)
+    species = layers.Dense(len(SPECIES), activation='softmax', name='species')(gate)
+
+    features = layers.GlobalAveragePooling2D(name='features_pool')(base_model.output)
+    heads = [
+        _breed_head(features, len(indices), f'{name}_breed')
+        for name, indices in zip(SPECIES, groups)
+    ]
+
+    # P(breed) = P(species) * P(breed | species), scattered back into class_names order.
+    # Fixed Dense layers instead of Lambdas keep the graph convertible to tfjs.
+    num_classes = len(class_names)
+    permutation = np.zeros((num_classes, num_classes), dtype=np.float32)
+    permutation[np.arange(num_classes), np.concatenate(groups)] = 1.0
+    expand = species_matrix(class_names, breed_classes).T
+
+    conditional = layers.Concatenate(name='conditional')(heads)
+    conditional = layers.Dense(num_classes, use_bias=False, trainable=False,
+                               name='conditional_order')(conditional)
+    prior = layers.Dense(num_classes, use_bias=False, trainable=False,
+                         name='species_prior')(species)
+    predictions = layers.Multiply(name='predictions')([conditional, prior])
+
+    model = keras.Model(inputs, [predictions, species], name=f"{config['model_name']}_hierarchical")
+    model.get_layer('conditional_order').set_weights([permutation])
+    model.get_layer('species_prior').set_weights([expand])
+    return model
+
+
+class SpeciesLabelSequence(keras.utils.Sequence):
+    """Wraps a breed-label generator to also yield species labels for the gate"""
+
+    def __init__(self, generator, matrix):
+        super().__init__()
+        self.generator = generator
+        self.matrix = matrix
+
+    def __len__(self):
+        return len(self.generator)
+
+    def __getitem__(self, index):
+        x, y = self.generator[index]
+        return x, (y, y @ self.matrix)
+
+    def on_epoch_end(self):
+        self.generator.on_epoch_end()
+
+
+class CascadeClassifier:
+    """Batched cascade inference over a trained hierarchical model.
+
+    - gate confidence < early_exit_threshold: return species only (stem + gate)
+    - gate confidence >= gate_threshold: run the backbone top and one head
+    - otherwise: run both heads and combine them like the training graph
+    """
+
+    def __init__(self, model, class_names, breed_classes, gate_layer,
+                 gate_threshold=0.9, early_exit_threshold=0.6):
+        self.class_names = list(class_names)
+        self.groups = species_index(class_names, breed_classes)
+        self.gate_threshold = gate_threshold
+        self.early_exit_threshold = early_exit_threshold
+
+        cut = model.get_layer(gate_layer).output
+        self.stem = keras.Model(model.input, [cut, model.get_layer('species').output])
+        features = model.get_layer('features_pool').output
+        self.trunk = keras.Model(cut, features)
+        self.heads = [
+            keras.Model(features, model.get_layer(f'{name}_breed').output)
+            for name in SPECIES
+        ]
+
+    def predict(self, images):
+        """Return (breed_probs, species_probs, path) for a batch of images.
+
+        breed_probs rows are NaN for early-exit images; path is 0 for early
+        exit, 1 for a single head and 2 for both heads.
+        """
+        cut, species = (np.asarray(t) for t in self.stem(images, training=False))
+        confidence = species.max(axis=1)
+        chosen = species.argmax(axis=1)
+
+        breed_probs = np.full((len(images), len(self.class_names)), np.nan, dtype=np.float32)
+        path = np.zeros(len(images), dtype=np.int32)
+
+        active = np.where(confidence >= self.early_exit_threshold)[0]
+        if len(active) == 0:
+            return breed_probs, species, path
+
+        features = np.asarray(self.trunk(cut[active], training=False))
+        single = confidence[active] >= self.gate_threshold
+        probs = np.zeros((len(active), len(self.class_names)), dtype=np.float32)
+
+        for s, indices in enumerate(self.groups):
+            # Rows that need this head: confident for this species, or ambiguous
+            rows = np.where(~single | (chosen[active] == s))[0]
+            if len(rows) == 0:
+                continue
+            head_probs = np.asarray(self.heads[s](features[rows], training=False))
+            weight = np.where(single[rows], 1.0, species[active[rows], s])[:, None]
+            probs[np.ix_(rows, indices)] += head_probs * weight
+
+        breed_probs[active] = probs
+        path[active] = np.where(single, 1, 2)
+        return breed_probs, species, path
+
+    def path_flops(self):
+        """FLOPs per image for each cascade path: [early exit, one head, both heads]"""
+        stem = count_flops(self.stem)
+        trunk = count_flops(self.trunk)
+        heads = [count_flops(head) for head in self.heads]
+        return [stem, stem + trunk + float(np.mean(heads)), stem + trunk + sum(heads)]
+
+
+def evaluate_cascade(cascade, flat_model, generator, species_of_class, max_batches=None):
+    """Compare accuracy and average FLOPs/latency per image of cascade vs flat model"""
+    path_flops = cascade.path_flops()
+    flat_flops = count_flops(flat_model)
+
+    stats = {'images': 0, 'flat_correct': 0, 'cascade_correct': 0, 'species_correct': 0,
+             'paths': np.zeros(3, dtype=np.int64), 'flat_time': 0.0, 'cascade_time': 0.0}
+
+    for batch_index in range(len(generator)):
+        if max_batches is not None and batch_index >= max_batches:
+            break
+        x, y = generator[batch_index]
+        true_classes = np.argmax(y, axis=1)
+
+        start = time.perf_counter()
+        flat_probs = flat_model.predict(x, verbose=0)
+        stats['flat_time'] += time.perf_counter() - start
+        if isinstance(flat_probs, (list, tuple)):
+            flat_probs = flat_probs[0]
+
+        start = time.perf_counter()
+        breed_probs, species, path = cascade.predict(x)
+        stats['cascade_time'] += time.perf_counter() - start
+
+        answered = path > 0
+        stats['images'] += len(x)
+        stats['flat_correct'] += int(np.sum(np.argmax(flat_probs, axis=1) == true_classes))
+        stats['cascade_correct'] += int(np.sum(
+            answered & (np.argmax(np.nan_to_num(breed_probs), axis=1) == true_classes)
+        ))
+        stats['species_correct'] += int(np.sum(species.argmax(axis=1) == species_of_class[true_classes]))
+        stats['paths'] += np.bincount(path, minlength=3)
+
+    n = max(stats['images'], 1)
+    path_share = stats['paths'] / n
+    sample = generator[0][0][:1]
+
+    return {
+        'images': stats['images'],
+        'flat': {
+            'accuracy': stats['flat_correct'] / n,
+            'flops_per_image': flat_flops,
+            'batch_ms_per_image': stats['flat_time'] / n * 1000,
+            'single_image_latency_ms': measure_latency(lambda t: flat_model(t, training=False), sample)
+        },
+        'cascade': {
+            'accuracy': stats['cascade_correct'] / n,
+            'species_accuracy': stats['species_correct'] / n,
+            'early_exit_rate': float(path_share[0]),
+            'single_head_rate': float(path_share[1]),
+            'both_heads_rate': float(path_share[2]),
+            'path_flops': path_flops,
+            'flops_per_image': float(np.dot(path_share, path_flops)),
+            'batch_ms_per_image': stats['cascade_time'] / n * 1000,
+            'single_image_latency_ms': measure_latency(cascade.predict, sample)
+        }
+    }
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Class-Incremental Updates for Cattle Breed Identification
+Grows the 'predictions' layer of a trained model for newly added breeds and
+trains mostly on the new classes plus a small replay buffer of old ones
+"""
+
+import json
+import random
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import tensorflow as tf
+from tensorflow import keras
+from tensorflow.keras import layers
+
+
+class FrozenColumns(keras.constraints.Constraint):
+    """Resets the first n_frozen output columns to their original values after every update"""
+
+    def __init__(self, frozen_values):
+        self.frozen_values = tf.constant(frozen_values)
+        self.n_frozen = frozen_values.shape[-1]
+
+    def __call__(self, w):
+        return tf.concat([self.frozen_values, w[..., self.n_frozen:]], axis=-1)
+
+
+def load_class_order(mapping_path):
+    """Class names ordered by their stable id, or None if no mapping exists yet"""
+    mapping_path = Path(mapping_path)
+    if not mapping_path.exists():
+        return None
+    with open(mapping_path) as f:
+        id_to_breed = json.load(f)['id_to_breed']
+    return [id_to_breed[str(i)] for i in range(len(id_to_breed))]
+
+
+def expand_classifier(model, num_classes, freeze_old_classes=True, layer_name='predictions'):
+    """Copy of a flat model with a wider classifier; existing class columns are kept as-is"""
+    old_layer = model.get_layer(layer_name)
+    if model.layers[-1] is not old_layer:
+        raise ValueError("Incremental updates need a flat model ending in the 'predictions' Dense layer")
+
+    old_kernel, old_bias = old_layer.get_weights()
+    old_classes = old_kernel.shape[1]
+    if num_classes <= old_classes:
+        raise ValueError(f"Model already has {old_classes} classes; nothing to add")
+
+    # New columns start like an average old class, so they don't dominate the softmax
+    rng = np.random.default_rng(42)
+    new_kernel = np.concatenate([
+        old_kernel,
+        old_kernel.mean(axis=1, keepdims=True)
+        + rng.normal(0, old_kernel.std() * 0.1, (old_kernel.shape[0], num_classes - old_classes))
+    ], axis=1).astype(np.float32)
+    new_bias = np.concatenate([old_bias, np.full(num_classes - old_classes, old_bias.mean())]).astype(np.float32)
+
+    predictions = layers.Dense(
+        num_classes,
+        activation='softmax',
+        name=layer_name,
+        kernel_constraint=FrozenColumns(old_kernel) if freeze_old_classes else None,
+        bias_constraint=FrozenColumns(old_bias) if freeze_old_classes else None
+    )
+    body = [layer for layer in model.layers[:-1] if not isinstance(layer, layers.InputLayer)]
+    expanded = keras.Sequential(
+        [keras.Input(shape=model.input_shape[1:], dtype=model.inputs[0].dtype), *body, predictions],
+        name=model.name
+    )
+    predictions.set_weights([new_kernel, new_bias])
+    return expanded
+
+
+def release_frozen_columns(model, layer_name='predictions'):
+    """Drop the FrozenColumns constraints so the model saves and exports normally"""
+    layer = model.get_layer(layer_name)
+    layer.kernel_constraint = None
+    layer.bias_constraint = None
+
+
+def replay_dataframe(train_dir, class_names, new_classes, replay_per_class, seed=42):
+    """All images of the new classes plus replay_per_class images of every old class"""
+    rng = random.Random(seed)
+    rows = []
+    for breed in class_names:
+        images = sorted(str(p) for p in (Path(train_dir) / breed).glob('*.jpg'))
+        if breed not in new_classes:
+            images = rng.sample(images, min(replay_per_class, len(images)))
+        rows.extend({'filename': image, 'class': breed} for image in images)
+    return pd.DataFrame(rows)
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Model Profiling Helpers for Cattle Breed Identification
+FLOP counting and CPU latency measurement shared by the evaluation stages.
+TensorFlow is imported only by count_flops, so measure_latency can time
+other runtimes without loading it
+"""
+
+import time
+
+import numpy as np
+
+
+def count_flops(model, batch_size=1):
+    """Float operations for one forward pass, from the frozen inference graph"""
+    import tensorflow as tf
+    from tensorflow.python.framework.convert_to_constants import convert_variables_to_constants_v2
+
+    specs = [
+        tf.TensorSpec([batch_size, *inp.shape[1:]], inp.dtype)
+        for inp in model.inputs
+    ]
+    concrete = tf.function(lambda *x: model(list(x) if len(x) > 1 else x[0], training=False))
+    frozen = convert_variables_to_constants_v2(concrete.get_concrete_function(*specs))
+
+    options = tf.compat.v1.profiler.ProfileOptionBuilder.float_operation()
+    options['output'] = 'none'
+    info = tf.compat.v1.profiler.profile(
+        graph=frozen.graph,
+        run_meta=tf.compat.v1.RunMetadata(),
+        cmd='op',
+        options=options
+    )
+    # The profiler counts a multiply-add as two float operations
+    return int(info.total_float_ops) // batch_size
+
+
+def measure_latency(fn, inputs, warmup=3, runs=20):
+    """Median wall time in milliseconds of fn(inputs)"""
+    for _ in range(warmup):
+        fn(inputs)
+
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn(inputs)
+        timings.append((time.perf_counter() - start) * 1000)
+    return float(np.median(timings))
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+ONNX Export and ONNX Runtime Inference for Cattle Breed Identification
+Converts the trained Keras model to ONNX (plain, graph-optimized and int8
+dynamic-quantized), provides a predictor with the same top-k output as the
+web app, and compares its load time, memory and latency with the SavedModel
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+
+from model_profiling import measure_latency
+from resource_monitor import current_rss_bytes, run_in_fresh_process
+
+
+def _file_size(path):
+    return Path(path).stat().st_size if Path(path).exists() else 0
+
+
+def export_onnx(model, output_dir, class_mapping, opset=13, quantize=True):
+    """Write model.onnx, model.optimized.onnx and (optionally) model.int8.onnx.
+
+    The ONNX input keeps the Keras model's dtype, so the uint8 model takes
+    raw 0-255 pixels. Returns a dict of variant name -> file path.
+    """
+    import onnxruntime as ort
+    import tensorflow as tf
+    import tf2onnx
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    spec = [tf.TensorSpec((None, *model.input_shape[1:]), model.inputs[0].dtype, name='pixels')]
+    paths = {'onnx': output_dir / 'model.onnx'}
+    tf2onnx.convert.from_keras(model, input_signature=spec, opset=opset, output_path=str(paths['onnx']))
+
+    # Keep the portable (extended) graph optimizations offline; ORT_ENABLE_ALL
+    # adds layout rewrites for this CPU, so those are left to the server's session
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED
+    paths['optimized'] = output_dir / 'model.optimized.onnx'
+    options.optimized_model_filepath = str(paths['optimized'])
+    ort.InferenceSession(str(paths['onnx']), options, providers=['CPUExecutionProvider'])
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        paths['int8'] = output_dir / 'model.int8.onnx'
+        quantize_dynamic(str(paths['onnx']), str(paths['int8']), weight_type=QuantType.QInt8)
+
+    with open(output_dir / 'class_mapping.json', 'w') as f:
+        json.dump(class_mapping, f, indent=2)
+
+    for name, path in paths.items():
+        print(f"  {name:<10} {path} ({_file_size(path) / 1e6:.1f} MB)")
+    return {name: str(path) for name, path in paths.items()}
+
+
+class _TopKPredictor:
+    """Shared top-k decoding; subclasses implement _scores(batch)"""
+
+    def __init__(self, class_mapping_path):
+        with open(class_mapping_path) as f:
+            mapping = json.load(f)
+        self.classes = mapping['classes']
+        self.breed_types = mapping.get('breed_types', {})
+        self.image_size = tuple(mapping['input_shape'][1:3])
+
+    def load_image(self, image_path):
+        """Decode like training (keras load_img, interpolation='nearest') without importing TF"""
+        from PIL import Image
+        with Image.open(image_path) as img:
+            img = img.convert('RGB')
+            if img.size != self.image_size[::-1]:
+                img = img.resize(self.image_size[::-1], Image.NEAREST)
+            return np.asarray(img, dtype=np.uint8)
+
+    def predict(self, images, top_k=3):
+        """Top-k [{'breed', 'confidence', 'category'}] per image, highest first.
+
+        images is a uint8 array of shape (H, W, 3) or (N, H, W, 3) with raw
+        0-255 pixels; a single image returns a single list.
+        """
+        images = np.asarray(images)
+        single = images.ndim == 3
+        scores = self._scores(images[None] if single else images)
+
+        results = []
+        for row in scores:
+            top = np.argsort(row)[::-1][:top_k]
+            results.append([
+                {
+                    'breed': self.classes[i],
+                    'confidence': round(float(row[i]), 4),
+                    'category': self.breed_types.get(self.classes[i], 'cattle')
+                }
+                for i in top
+            ])
+        return results[0] if single else results
+
+    def predict_image(self, image_path, top_k=3):
+        return self.predict(self.load_image(image_path), top_k=top_k)
+
+
+class OnnxPredictor(_TopKPredictor):
+    """CPU inference through ONNX Runtime; TensorFlow is never imported"""
+
+    def __init__(self, model_path, class_mapping_path=None, num_threads=None):
+        import onnxruntime as ort
+
+        model_path = Path(model_path)
+        super().__init__(class_mapping_path or model_path.parent / 'class_mapping.json')
+
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        # Hardware-specific optimizations run here, on the machine that serves
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(str(model_path), options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+        self.input_dtype = np.uint8 if 'uint8' in self.session.get_inputs()[0].type else np.float32
+
+    def _scores(self, batch):
+        return self.session.run(None, {self.input_name: batch.astype(self.input_dtype)})[0]
+
+
+class SavedModelPredictor(_TopKPredictor):
+    """Same contract backed by the TensorFlow SavedModel, for comparison"""
+
+    def __init__(self, saved_model_dir, class_mapping_path):
+        import tensorflow as tf
+
+        super().__init__(class_mapping_path)
+        self._tf = tf
+        self.model = tf.saved_model.load(str(saved_model_dir))
+        self.signature = self.model.signatures['serving_default']
+        spec = self.signature.structured_input_signature[1]
+        self.input_name, self.input_spec = next(iter(spec.items()))
+
+    def _scores(self, batch):
+        inputs = self._tf.constant(batch, dtype=self.input_spec.dtype)
+        outputs = self.signature(**{self.input_name: inputs})
+        return next(iter(outputs.values())).numpy()
+
+
+def _measure_backend(backend, model_path, class_mapping_path, batch, runs, queue):
+    """Child process: time import + load, then RSS, latency and top-1 of one backend"""
+    rss_before = current_rss_bytes()
+    start = time.perf_counter()
+    if backend == 'saved_model':
+        predictor = SavedModelPredictor(model_path, class_mapping_path)
+    else:
+        predictor = OnnxPredictor(model_path, class_mapping_path)
+    load_seconds = time.perf_counter() - start
+    rss_loaded = current_rss_bytes()
+
+    first = time.perf_counter()
+    predictor.predict(batch[:1])
+    first_ms = (time.perf_counter() - first) * 1000
+
+    queue.put({
+        'backend': backend,
+        'model_path': str(model_path),
+        'load_seconds': load_seconds,
+        'first_prediction_ms': first_ms,
+        'rss_after_load_mb': rss_loaded / 1e6,
+        'rss_load_delta_mb': (rss_loaded - rss_before) / 1e6,
+        'latency_ms_batch1': measure_latency(predictor.predict, batch[:1], runs=runs),
+        f"latency_ms_batch{len(batch)}": measure_latency(predictor.predict, batch, runs=runs),
+        'rss_after_inference_mb': current_rss_bytes() / 1e6,
+        'top1': [p[0]['breed'] for p in predictor.predict(batch)]
+    })
+
+
+def compare_backends(saved_model_dir, onnx_dir, image_size=(224, 224), batch_size=8, runs=20, timeout=600):
+    """Load time, RSS and latency of SavedModel vs every ONNX variant, each in a fresh process.
+
+    Raises RuntimeError if a backend fails in its child (e.g. onnxruntime
+    missing or a model that won't load) and TimeoutError after timeout seconds.
+    """
+    onnx_dir = Path(onnx_dir)
+    class_mapping_path = onnx_dir / 'class_mapping.json'
+    batch = np.random.default_rng(0).integers(0, 256, (batch_size, *image_size, 3), dtype=np.uint8)
+
+    backends = [('saved_model', Path(saved_model_dir))] + [
+        (path.stem.replace('model', 'onnx'), path) for path in sorted(onnx_dir.glob('model*.onnx'))
+    ]
+
+    results = []
+    for backend, model_path in backends:
+        results.append(run_in_fresh_process(
+            _measure_backend, (backend, model_path, class_mapping_path, batch, runs), timeout=timeout
+        ))
+
+    reference = results[0]['top1']
+    for row in results:
+        row['top1_agreement'] = float(np.mean([a == b for a, b in zip(row.pop('top1'), reference)]))
+        row['model_bytes'] = sum(p.stat().st_size for p in Path(row['model_path']).rglob('*') if p.is_file()) \
+            if Path(row['model_path']).is_dir() else _file_size(row['model_path'])
+        print(f"  {row['backend']:<16} load {row['load_seconds']:6.2f}s  "
+              f"RSS {row['rss_after_load_mb']:7.1f} MB  "
+              f"latency {row['latency_ms_batch1']:7.2f} ms  "
+              f"agreement {row['top1_agreement']:.2f}")
+    return results
+
+
+def main():
+    """Compare the SavedModel and ONNX backends"""
+    parser = argparse.ArgumentParser(description="Benchmark ONNX Runtime against the SavedModel")
+    parser.add_argument('--saved-model', default='models/cattle_breed_model')
+    parser.add_argument('--onnx-dir', default='models/onnx')
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--output', default='results/onnx_benchmark.json')
+    args = parser.parse_args()
+
+    results = compare_backends(args.saved_model, args.onnx_dir, batch_size=args.batch_size, runs=args.runs)
+
+    Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
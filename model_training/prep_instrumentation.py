@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Data Preparation Instrumentation for Cattle Breed Identification
+Per-stage cumulative time, counts, bytes read/written and rejection reasons
+for DataPreparator, plus a throttled progress/throughput/ETA line. Every
+method returns immediately when disabled, so leaving the hooks in the hot
+path costs nothing measurable
+"""
+
+import json
+import sys
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager, nullcontext
+
+from resource_monitor import max_rss_bytes
+
+
+class PrepInstrumentation:
+    """Accumulates stage statistics from the main process and worker results"""
+
+    def __init__(self, enabled=False, progress=True, interval=0.5):
+        self.enabled = enabled
+        self.show_progress = enabled and progress
+        self.interval = interval
+        self.stages = defaultdict(lambda: {'seconds': 0.0, 'count': 0, 'bytes_read': 0, 'bytes_written': 0})
+        self.rejections = Counter()
+        self.breeds = {}
+        self.placement = None
+        self._last_progress = 0.0
+        self._started = time.perf_counter()
+
+    def stage(self, name):
+        """Context manager adding wall time (and one count) to a main-process stage"""
+        if not self.enabled:
+            return nullcontext()
+        return self._timed(name)
+
+    @contextmanager
+    def _timed(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name, seconds=0.0, count=1, bytes_read=0, bytes_written=0):
+        if not self.enabled:
+            return
+        stage = self.stages[name]
+        stage['seconds'] += seconds
+        stage['count'] += count
+        stage['bytes_read'] += bytes_read
+        stage['bytes_written'] += bytes_written
+
+    def add_worker_timings(self, timings):
+        """Merge the {stage: (seconds, bytes_read, bytes_written)} dict a worker returned"""
+        if not self.enabled or not timings:
+            return
+        for name, (seconds, bytes_read, bytes_written) in timings.items():
+            self.add(name, seconds, 1, bytes_read, bytes_written)
+
+    def reject(self, reason, count=1):
+        if self.enabled:
+            self.rejections[reason] += count
+
+    def iterate(self, name, iterable):
+        """Yield from iterable, charging the time spent producing items to a stage"""
+        if not self.enabled:
+            return iterable
+        return self._timed_iter(name, iterable)
+
+    def _timed_iter(self, name, iterable):
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.add(name, time.perf_counter() - start, count=0)
+                return
+            self.add(name, time.perf_counter() - start)
+            yield item
+
+    def progress(self, label, done, total=None, start=None, final=False):
+        """Throttled single-line progress with throughput and, when total is known, ETA"""
+        if not self.show_progress:
+            return
+        now = time.perf_counter()
+        if not final and now - self._last_progress < self.interval:
+            return
+        self._last_progress = now
+
+        elapsed = now - (start if start is not None else self._started)
+        rate = done / elapsed if elapsed > 0 else 0.0
+        line = f"  {label}: {done}" + (f"/{total}" if total else "") + f" images, {rate:.1f} img/s"
+        if total and rate > 0 and done < total:
+            line += f", ETA {(total - done) / rate:.0f}s"
+        sys.stdout.write(f"\r{line:<79}" + ("\n" if final else ""))
+        sys.stdout.flush()
+
+    def breed_done(self, breed, images, worker_seconds, bytes_written):
+        """Record a breed's transcode cost, measured inside the workers"""
+        if self.enabled:
+            self.breeds[breed] = {
+                'images': images,
+                'worker_seconds': worker_seconds,
+                'images_per_worker_second': images / worker_seconds if worker_seconds > 0 else None,
+                'bytes_written': bytes_written
+            }
+
+    def report(self):
+        stages = {}
+        for name, stage in self.stages.items():
+            stages[name] = {
+                **stage,
+                'ms_per_item': stage['seconds'] * 1000 / stage['count'] if stage['count'] else None
+            }
+        return {
+            'wall_seconds': time.perf_counter() - self._started,
+            'stages': stages,
+            'rejections': dict(self.rejections),
+            'breeds': self.breeds,
+            'placement': self.placement,
+            'max_rss_mb': max_rss_bytes() / 1e6
+        }
+
+    def write(self, path):
+        """Write the report as JSON; no-op when disabled"""
+        if not self.enabled:
+            return None
+        report = self.report()
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+
+        print("\nPreparation timing (worker stages are summed over processes):")
+        for name, stage in report['stages'].items():
+            per_item = f"{stage['ms_per_item']:8.2f} ms/item" if stage['ms_per_item'] is not None else ''
+            print(f"  {name:<14} {stage['seconds']:8.2f}s  {stage['count']:>7} items  {per_item}")
+        if self.rejections:
+            print("  rejected: " + ", ".join(f"{k} {v}" for k, v in self.rejections.most_common()))
+        print(f"Timing report saved to {path}")
+        return report
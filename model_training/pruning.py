@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Structured Pruning for Cattle Breed Identification
+Removes low-magnitude expansion channels from the EfficientNet MBConv blocks
+and low-magnitude units from the dense head, producing a genuinely smaller
+flat model (fewer FLOPs, not just sparse weights) that exports like any other
+"""
+
+import re
+
+import numpy as np
+import tensorflow as tf
+from tensorflow import keras
+from tensorflow.keras import layers
+
+from fine_tuning import unfreeze_top_blocks
+from model_profiling import count_flops, measure_latency
+
+# MBConv blocks with an expansion conv (block1a has expand_ratio 1)
+_EXPAND_CONV = re.compile(r'^(block[2-7][a-z]_)expand_conv$')
+
+
+def _keep_count(n, sparsity, multiple=8):
+    """Channels left after pruning, rounded to a SIMD-friendly multiple"""
+    keep = int(round(n * (1 - sparsity) / multiple)) * multiple
+    return int(min(n, max(multiple, keep)))
+
+
+def _top_indices(scores, count):
+    """Indices of the count largest scores, in their original order"""
+    return np.sort(np.argsort(scores)[::-1][:count])
+
+
+def backbone_channel_plan(backbone, sparsity):
+    """Kept expansion channels per MBConv block prefix, ranked by L1 norm of the expand filters"""
+    plan = {}
+    for layer in backbone.layers:
+        match = _EXPAND_CONV.match(layer.name)
+        if not match:
+            continue
+        kernel = layer.get_weights()[0]
+        scores = np.abs(kernel).sum(axis=(0, 1, 2))
+        plan[match.group(1)] = _top_indices(scores, _keep_count(len(scores), sparsity))
+    return plan
+
+
+def _sliced_backbone_weights(layer, plan):
+    """Original weights of a backbone layer, sliced to the kept channels of its block"""
+    weights = layer.get_weights()
+    prefix = next((p for p in plan if layer.name.startswith(p)), None)
+    if prefix is None:
+        return weights
+    keep = plan[prefix]
+    suffix = layer.name[len(prefix):]
+
+    if suffix == 'expand_conv':
+        return [weights[0][..., keep]]
+    if suffix in ('expand_bn', 'bn'):
+        return [w[keep] for w in weights]
+    if suffix == 'dwconv':
+        return [weights[0][:, :, keep, :]]
+    if suffix == 'se_reduce':
+        return [weights[0][:, :, keep, :], weights[1]]
+    if suffix == 'se_expand':
+        return [weights[0][..., keep], weights[1][keep]]
+    if suffix == 'project_conv':
+        return [weights[0][:, :, keep, :]]
+    return weights
+
+
+def prune_backbone(backbone, sparsity):
+    """Copy of the EfficientNet backbone with fewer expansion channels per block"""
+    plan = backbone_channel_plan(backbone, sparsity)
+
+    def clone_layer(layer):
+        config = layer.get_config()
+        match = re.match(r'^(block[2-7][a-z]_)(expand_conv|se_expand|se_reshape)$', layer.name)
+        if match and match.group(1) in plan:
+            kept = len(plan[match.group(1)])
+            if match.group(2) == 'se_reshape':
+                # The SE reshape hard-codes the block's channel count
+                config['target_shape'] = (1, 1, kept)
+            else:
+                config['filters'] = kept
+        return layer.__class__.from_config(config)
+
+    pruned = keras.models.clone_model(backbone, clone_function=clone_layer)
+    for src in backbone.layers:
+        pruned.get_layer(src.name).set_weights(_sliced_backbone_weights(src, plan))
+    pruned.trainable = backbone.trainable
+    return pruned
+
+
+def prune_flat_model(model, sparsity, input_dtype=None):
+    """Structurally pruned copy of the flat model: backbone channels and hidden dense units"""
+    body = [layer for layer in model.layers if not isinstance(layer, layers.InputLayer)]
+    if body[-1].name != 'predictions':
+        raise ValueError("Structured pruning needs the flat model ending in 'predictions'")
+
+    new_layers = []
+    weights = []
+    keep_in = None  # Kept features of the previous layer; None means all
+
+    for layer in body:
+        if layer.name.startswith('efficientnet') and hasattr(layer, 'layers'):
+            new_layers.append(prune_backbone(layer, sparsity))
+            weights.append(None)
+            continue
+
+        layer_weights = layer.get_weights()
+        config = layer.get_config()
+
+        if isinstance(layer, layers.Dense):
+            kernel, bias = layer_weights
+            if keep_in is not None:
+                kernel = kernel[keep_in]
+            if layer.name == 'predictions':
+                layer_weights = [kernel, bias]
+            else:
+                keep = _top_indices(np.abs(kernel).sum(axis=0), _keep_count(kernel.shape[1], sparsity))
+                config['units'] = len(keep)
+                layer_weights = [kernel[:, keep], bias[keep]]
+                keep_in = keep
+        elif isinstance(layer, layers.BatchNormalization) and keep_in is not None:
+            layer_weights = [w[keep_in] for w in layer_weights]
+
+        new_layers.append(layer.__class__.from_config(config))
+        weights.append(layer_weights)
+
+    dtype = input_dtype or model.inputs[0].dtype
+    pruned = keras.Sequential(
+        [keras.Input(shape=model.input_shape[1:], dtype=dtype), *new_layers],
+        name=model.name
+    )
+    for layer, layer_weights in zip(new_layers, weights):
+        if layer_weights is not None:
+            layer.set_weights(layer_weights)
+    return pruned
+
+
+def profile_model(model, validation_generator, image_size):
+    """FLOPs, parameters, single-image CPU latency and validation accuracy"""
+    sample = np.random.default_rng(0).integers(
+        0, 256, (1, *image_size, 3)
+    ).astype(model.inputs[0].dtype.name)
+    predict = tf.function(lambda x: model(x, training=False))
+
+    predictions = model.predict(validation_generator, verbose=0)
+    accuracy = float(np.mean(np.argmax(predictions, axis=1) == validation_generator.classes))
+
+    return {
+        'flops': count_flops(model),
+        'params': int(model.count_params()),
+        'cpu_latency_ms': measure_latency(predict, sample),
+        'accuracy': accuracy
+    }
+
+
+def sparsity_sweep(trainer, train_generator, validation_generator, sparsities,
+                   fine_tune_epochs=2, fine_tune_blocks=2, learning_rate=1e-5):
+    """Prune the trainer's model at each sparsity, fine-tune briefly and profile.
+
+    Returns (report, models) where report lists one row per sparsity (0.0 is
+    the unpruned baseline) and models maps sparsity to the pruned model.
+    """
+    image_size = trainer.config['image_size']
+    base = trainer.inference_model()
+    report = [{'sparsity': 0.0, **profile_model(base, validation_generator, image_size)}]
+    models = {0.0: trainer.model}
+    print(f"  baseline: {report[0]['flops'] / 1e9:.3f} GFLOPs, {report[0]['params']:,} params, "
+          f"{report[0]['cpu_latency_ms']:.1f} ms, accuracy {report[0]['accuracy']:.4f}")
+
+    for sparsity in sparsities:
+        pruned = prune_flat_model(base, sparsity)
+        accuracy_before = profile_model(pruned, validation_generator, image_size)['accuracy']
+
+        # The wrapper shares layers with pruned, so profiling pruned sees the update
+        model = trainer.with_accumulation(pruned)
+        if fine_tune_epochs:
+            unfreeze_top_blocks(pruned, fine_tune_blocks)
+            trainer.compile_model(model, learning_rate)
+            model.fit(train_generator, validation_data=validation_generator,
+                      epochs=fine_tune_epochs, verbose=1)
+
+        row = {
+            'sparsity': sparsity,
+            **profile_model(pruned, validation_generator, image_size),
+            'accuracy_before_fine_tune': accuracy_before
+        }
+        report.append(row)
+        models[sparsity] = model
+        print(f"  sparsity {sparsity:.2f}: {row['flops'] / 1e9:.3f} GFLOPs, {row['params']:,} params, "
+              f"{row['cpu_latency_ms']:.1f} ms, accuracy {accuracy_before:.4f} -> {row['accuracy']:.4f}")
+
+    return report, models
+
+
+def choose_sparsity(report, max_accuracy_drop):
+    """Highest sparsity whose accuracy stays within max_accuracy_drop of the baseline"""
+    baseline = report[0]['accuracy']
+    eligible = [row['sparsity'] for row in report if baseline - row['accuracy'] <= max_accuracy_drop]
+    return max(eligible)
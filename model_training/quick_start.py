@@ -174,11 +174,13 @@ def main():
     
     if kaggle_ready:
         print("1. Run: python data_preparation.py")
-        print("2. Run: python train_model.py")
+        print("2. Seed backbone weights once: python weight_store.py seed efficientnetb0_notop")
+        print("3. Run: python train_model.py")
     else:
         print("1. Setup Kaggle API credentials")
         print("2. Test with: python test_trainer.py")
-        print("3. Then run full training pipeline")
+        print("3. Benchmark the real pipeline on synthetic data: python benchmark_pipeline.py")
+        print("4. Then run full training pipeline")
     
     print("\n✅ Setup completed!")
 
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Resource Monitoring Helpers for Cattle Breed Identification
+Wall time and resident memory (RSS) tracking for pipeline stages, without
+importing TensorFlow
+"""
+
+import multiprocessing
+import os
+import queue as queue_module
+import resource
+import sys
+import threading
+import time
+
+
+def current_rss_bytes():
+    """Current resident set size of this process"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return max_rss_bytes()
+
+
+def max_rss_bytes():
+    """Peak RSS of this process since it started"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS and kilobytes on Linux
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def run_in_fresh_process(target, args=(), timeout=1800, poll=1.0):
+    """Call target(*args, queue) in a new spawned process and return what it puts on queue.
+
+    Used for measurements that need a clean process (load time, peak RSS).
+    Raises RuntimeError as soon as the child exits without a result or with
+    a non-zero exit code, and TimeoutError (after terminating the child) if
+    no result arrives within timeout seconds.
+    """
+    name = getattr(target, '__name__', 'child')
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    process = context.Process(target=target, args=(*args, queue))
+    process.start()
+    deadline = time.monotonic() + timeout
+
+    try:
+        while True:
+            try:
+                result = queue.get(timeout=poll)
+                break
+            except queue_module.Empty:
+                pass
+            if not process.is_alive():
+                # The result may have landed just before the child exited
+                try:
+                    result = queue.get(timeout=poll)
+                    break
+                except queue_module.Empty:
+                    raise RuntimeError(f"{name} exited with code {process.exitcode} without a result")
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"{name} gave no result within {timeout}s")
+    except BaseException:
+        if process.is_alive():
+            process.terminate()
+        process.join()
+        raise
+
+    process.join(timeout)
+    if process.is_alive():
+        process.terminate()
+        process.join()
+    if process.exitcode != 0:
+        raise RuntimeError(f"{name} exited with code {process.exitcode}")
+    return result
+
+
+class PeakRSSSampler:
+    """Context manager sampling RSS on a background thread to find a stage's peak"""
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.start_rss = 0
+        self.peak_rss = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak_rss = max(self.peak_rss, current_rss_bytes())
+
+    def __enter__(self):
+        self.start_rss = self.peak_rss = current_rss_bytes()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak_rss = max(self.peak_rss, current_rss_bytes())
+        return False
+
+
+class StageTimer:
+    """Records wall time, item throughput and peak RSS for named stages"""
+
+    def __init__(self):
+        self.stages = {}
+
+    def stage(self, name, items=None):
+        return _Stage(self, name, items)
+
+    def report(self):
+        return {
+            'stages': self.stages,
+            'total_seconds': sum(s['seconds'] for s in self.stages.values()),
+            'max_rss_mb': max_rss_bytes() / 1e6
+        }
+
+
+class _Stage:
+    def __init__(self, timer, name, items):
+        self.timer = timer
+        self.name = name
+        self.items = items
+        self.extra = {}
+        self._sampler = PeakRSSSampler()
+
+    def __enter__(self):
+        self._sampler.__enter__()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self._start
+        self._sampler.__exit__(exc_type, exc, tb)
+
+        record = {
+            'seconds': seconds,
+            'peak_rss_mb': self._sampler.peak_rss / 1e6,
+            'rss_delta_mb': (self._sampler.peak_rss - self._sampler.start_rss) / 1e6,
+            'status': 'ok' if exc_type is None else f"error: {exc}"
+        }
+        if self.items is not None:
+            record['items'] = self.items
+            record['items_per_second'] = self.items / seconds if seconds > 0 else None
+        record.update(self.extra)
+
+        self.timer.stages[self.name] = record
+        return False
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Shared Decoded-Image Cache for Cattle Breed Identification
+Host-wide cache of decoded, resized uint8 images in shared memory (/dev/shm),
+keyed by image content hash and target size. The first trainer to need an
+image decodes it; every other process on the box maps the same pages and
+gets a zero-copy NumPy view. Total size is held to a byte budget by
+evicting the least recently used entries
+"""
+
+import hashlib
+import os
+import re
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+from tensorflow.keras.preprocessing.image import DirectoryIterator
+
+# data_preparation names processed files <breed>_<first 16 hex of SHA-256>.jpg
+_HASHED_NAME = re.compile(r'_([0-9a-f]{16})\.jpe?g$')
+
+_RESAMPLE = {
+    'nearest': Image.NEAREST,
+    'bilinear': Image.BILINEAR,
+    'bicubic': Image.BICUBIC,
+    'lanczos': Image.LANCZOS,
+    'box': Image.BOX,
+    'hamming': Image.HAMMING
+}
+
+
+def default_cache_root():
+    base = Path('/dev/shm') if Path('/dev/shm').is_dir() else Path(tempfile.gettempdir())
+    return Path(os.environ.get('IMAGE_CACHE_DIR', base / 'bharat_pashudhan_images'))
+
+
+def decode_image(path, target_size, interpolation='nearest'):
+    """RGB uint8 array, decoded and resized the same way as keras load_img"""
+    with Image.open(path) as img:
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+        height, width = target_size
+        if img.size != (width, height):
+            img = img.resize((width, height), _RESAMPLE[interpolation])
+        return np.asarray(img, dtype=np.uint8)
+
+
+class SharedImageCache:
+    """One <hash>_<H>x<W>_<interpolation>.u8 file per decoded image under root.
+
+    Entries are written to a temp file and renamed into place, so concurrent
+    fillers never expose partial data and the first finished writer wins.
+    A hit bumps the file's mtime, and eviction removes the oldest mtimes, which
+    gives an approximate LRU shared by every process. Each process tracks the
+    cache size from its own scans plus its own writes, so the budget is
+    enforced approximately when several processes fill at once. Removing a
+    file that another process has mapped is safe; its view stays valid.
+    """
+
+    def __init__(self, root=None, budget_bytes=4 << 30, evict_to=0.9):
+        self.root = Path(root) if root else default_cache_root()
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.budget_bytes = budget_bytes
+        self.evict_to = evict_to
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes_added = 0
+        self._hashes = {}
+        self._approx_bytes = self._scan()[1]
+
+    def _scan(self):
+        entries = []
+        total = 0
+        for entry in os.scandir(self.root):
+            if entry.name.endswith('.u8'):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue  # Evicted by another process meanwhile
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+        return entries, total
+
+    def image_hash(self, path):
+        """Content hash: taken from hashed file names, otherwise SHA-256 of the bytes (memoized)"""
+        match = _HASHED_NAME.search(str(path))
+        if match:
+            return match.group(1)
+        stat = os.stat(path)
+        memo_key = (str(path), stat.st_size, stat.st_mtime_ns)
+        if memo_key not in self._hashes:
+            with open(path, 'rb') as f:
+                self._hashes[memo_key] = hashlib.sha256(f.read()).hexdigest()[:16]
+        return self._hashes[memo_key]
+
+    def entry_path(self, path, target_size, interpolation='nearest'):
+        height, width = target_size
+        return self.root / f"{self.image_hash(path)}_{height}x{width}_{interpolation}.u8"
+
+    def get(self, path, target_size, interpolation='nearest'):
+        """Decoded (H, W, 3) uint8 image; a read-only view of shared memory on a hit"""
+        entry = self.entry_path(path, target_size, interpolation)
+        shape = (*target_size, 3)
+        try:
+            view = np.memmap(entry, dtype=np.uint8, mode='r', shape=shape)
+        except (FileNotFoundError, ValueError):
+            view = None
+        if view is not None:
+            self.hits += 1
+            try:
+                os.utime(entry)
+            except FileNotFoundError:
+                pass
+            return view
+
+        self.misses += 1
+        pixels = decode_image(path, target_size, interpolation)
+        self._store(entry, pixels)
+        return pixels
+
+    def _store(self, entry, pixels):
+        tmp = entry.with_name(f".{entry.name}.{os.getpid()}.tmp")
+        try:
+            with open(tmp, 'wb') as f:
+                f.write(pixels.tobytes())
+            os.replace(tmp, entry)
+        except OSError as e:
+            # A full /dev/shm should slow training down, not stop it
+            tmp.unlink(missing_ok=True)
+            print(f"⚠️ Image cache write failed ({e}); evicting")
+            self.evict()
+            return
+        self.bytes_added += pixels.nbytes
+        self._approx_bytes += pixels.nbytes
+        if self._approx_bytes > self.budget_bytes:
+            self.evict()
+
+    def evict(self):
+        """Delete least recently used entries until the cache is under evict_to * budget"""
+        entries, total = self._scan()
+        target = self.budget_bytes * self.evict_to
+        for _, size, path in sorted(entries):
+            if total <= target:
+                break
+            try:
+                os.unlink(path)
+                self.evictions += 1
+            except FileNotFoundError:
+                pass
+            total -= size
+        self._approx_bytes = total
+
+    def clear(self):
+        for entry in self.root.glob('*.u8'):
+            entry.unlink(missing_ok=True)
+        self._approx_bytes = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'root': str(self.root),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else None,
+            'evictions': self.evictions,
+            'bytes_added': self.bytes_added,
+            'cache_bytes': self._scan()[1],
+            'budget_bytes': self.budget_bytes,
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S')
+        }
+
+
+class CachedDirectoryIterator(DirectoryIterator):
+    """DirectoryIterator that loads images through a SharedImageCache.
+
+    Augmentation still runs per batch on a float copy, so only the decode and
+    resize are shared. Supports the categorical, sparse and None class modes.
+    """
+
+    def __init__(self, directory, image_data_generator, image_cache, **kwargs):
+        self.image_cache = image_cache
+        super().__init__(directory, image_data_generator, **kwargs)
+        if self.class_mode not in ('categorical', 'sparse', None):
+            raise ValueError(f"CachedDirectoryIterator does not support class_mode={self.class_mode!r}")
+
+    def load_image(self, path):
+        return self.image_cache.get(path, self.target_size, self.interpolation)
+
+    def _get_batches_of_transformed_samples(self, index_array):
+        batch_x = np.zeros((len(index_array),) + self.image_shape, dtype=self.dtype)
+        filepaths = self.filepaths
+        for i, j in enumerate(index_array):
+            x = self.load_image(filepaths[j])
+            if self.image_data_generator:
+                x = x.astype(np.float32)
+                params = self.image_data_generator.get_random_transform(x.shape)
+                x = self.image_data_generator.apply_transform(x, params)
+                x = self.image_data_generator.standardize(x)
+            batch_x[i] = x
+
+        if self.class_mode is None:
+            return batch_x
+        if self.class_mode == 'sparse':
+            batch_y = self.classes[index_array].astype(self.dtype)
+        else:
+            batch_y = np.zeros((len(batch_x), len(self.class_indices)), dtype=self.dtype)
+            batch_y[np.arange(len(batch_x)), self.classes[index_array]] = 1
+        return batch_x, batch_y
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Synthetic Dataset Generator for Cattle Breed Identification
+Fabricates a data/raw tree shaped like the Kaggle datasets (one folder per
+breed, mixed formats and sizes, corrupt files and duplicates) so the full
+pipeline can be exercised and benchmarked offline
+"""
+
+import random
+import shutil
+from pathlib import Path
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter
+
+from data_preparation import DataPreparator
+
+DEFAULT_SYNTHETIC_CONFIG = {
+    'output_dir': 'data/raw/indian_bovine',
+    'breeds': None,                 # None = all 43 breeds
+    'images_per_breed': 40,
+    'size_mean': (640, 480),        # median width/height in pixels
+    'size_sigma': 0.35,             # log-normal spread of the scale factor
+    'small_rate': 0.03,             # images below the 100px validation limit
+    'extreme_aspect_rate': 0.02,    # aspect ratio > 5, rejected by validation
+    'png_rate': 0.15,
+    'rgba_rate': 0.05,
+    'corrupt_rate': 0.03,
+    'duplicate_rate': 0.05,
+    'seed': 42
+}
+
+
+def _breed_style(breed, rng):
+    """Stable per-breed colours and body proportions so classes are learnable"""
+    style_rng = random.Random(breed)
+    return {
+        'coat': tuple(style_rng.randint(40, 230) for _ in range(3)),
+        'patch': tuple(style_rng.randint(0, 255) for _ in range(3)),
+        'background': tuple(style_rng.randint(60, 200) for _ in range(3)),
+        'body_ratio': style_rng.uniform(1.3, 2.2),
+        'patches': style_rng.randint(0, 4)
+    }
+
+
+def _image_size(config, rng):
+    roll = rng.random()
+    if roll < config['small_rate']:
+        return rng.randint(40, 99), rng.randint(40, 99)
+    if roll < config['small_rate'] + config['extreme_aspect_rate']:
+        height = rng.randint(100, 200)
+        return height * rng.randint(6, 8), height
+
+    scale = float(np.exp(rng.gauss(0.0, config['size_sigma'])))
+    width = max(100, int(config['size_mean'][0] * scale))
+    height = max(100, int(config['size_mean'][1] * scale * rng.uniform(0.8, 1.25)))
+    return width, height
+
+
+def render_image(breed, size, rng):
+    """Draw a crude animal silhouette in breed-specific colours on a noisy background"""
+    style = _breed_style(breed, rng)
+    width, height = size
+
+    noise = np.random.default_rng(rng.randint(0, 2**31)).normal(0, 18, (height, width, 3))
+    background = np.clip(np.array(style['background']) + noise, 0, 255).astype(np.uint8)
+    img = Image.fromarray(background, 'RGB')
+    draw = ImageDraw.Draw(img)
+
+    body_w = width * rng.uniform(0.45, 0.7)
+    body_h = body_w / style['body_ratio']
+    cx = width * rng.uniform(0.35, 0.65)
+    cy = height * rng.uniform(0.45, 0.6)
+    body = [cx - body_w / 2, cy - body_h / 2, cx + body_w / 2, cy + body_h / 2]
+    jitter = tuple(int(np.clip(c + rng.randint(-15, 15), 0, 255)) for c in style['coat'])
+    draw.ellipse(body, fill=jitter)
+
+    head_r = body_h * 0.35
+    hx = body[2] if rng.random() < 0.5 else body[0]
+    draw.ellipse([hx - head_r, cy - body_h * 0.6 - head_r, hx + head_r, cy - body_h * 0.6 + head_r], fill=jitter)
+
+    for _ in range(style['patches']):
+        px = rng.uniform(body[0], body[2])
+        py = rng.uniform(body[1], body[3])
+        pr = body_h * rng.uniform(0.1, 0.25)
+        draw.ellipse([px - pr, py - pr, px + pr, py + pr], fill=style['patch'])
+
+    return img.filter(ImageFilter.GaussianBlur(radius=rng.uniform(0, 1.5)))
+
+
+def generate_synthetic_dataset(config=None):
+    """Write the synthetic raw dataset and return a summary of what was produced"""
+    config = {**DEFAULT_SYNTHETIC_CONFIG, **(config or {})}
+    rng = random.Random(config['seed'])
+    output_dir = Path(config['output_dir'])
+
+    if output_dir.exists():
+        shutil.rmtree(output_dir)
+
+    breeds = config['breeds'] or list(DataPreparator().target_breeds)
+    summary = {'breeds': len(breeds), 'images': 0, 'corrupt': 0, 'duplicates': 0,
+               'small': 0, 'extreme_aspect': 0, 'bytes': 0}
+
+    for breed in breeds:
+        # Kaggle folders use spaces and mixed case, e.g. "Red Sindhi"
+        breed_dir = output_dir / breed.replace('_', ' ')
+        breed_dir.mkdir(parents=True, exist_ok=True)
+        written = []
+
+        for i in range(config['images_per_breed']):
+            if written and rng.random() < config['duplicate_rate']:
+                source = rng.choice(written)
+                dest = breed_dir / f"dup_{i:05d}{source.suffix}"
+                shutil.copyfile(source, dest)
+                summary['duplicates'] += 1
+                summary['bytes'] += dest.stat().st_size
+                continue
+
+            size = _image_size(config, rng)
+            if min(size) < 100:
+                summary['small'] += 1
+            elif max(size) / min(size) > 5:
+                summary['extreme_aspect'] += 1
+
+            img = render_image(breed, size, rng)
+            if rng.random() < config['png_rate']:
+                if rng.random() < config['rgba_rate'] / max(config['png_rate'], 1e-9):
+                    img = img.convert('RGBA')
+                dest = breed_dir / f"img_{i:05d}.png"
+                img.save(dest, 'PNG')
+            else:
+                dest = breed_dir / f"img_{i:05d}.jpg"
+                img.save(dest, 'JPEG', quality=rng.randint(70, 95))
+
+            if rng.random() < config['corrupt_rate']:
+                # Truncate the file so decoding fails part-way, like a broken download
+                data = dest.read_bytes()
+                dest.write_bytes(data[:max(16, len(data) // 3)])
+                summary['corrupt'] += 1
+            else:
+                written.append(dest)
+
+            summary['images'] += 1
+            summary['bytes'] += dest.stat().st_size
+
+    print(f"Synthetic dataset: {summary['images'] + summary['duplicates']} files "
+          f"({summary['bytes'] / 1e6:.1f} MB) across {summary['breeds']} breeds in {output_dir}")
+    return summary
+
+
+def main():
+    """Generate the default synthetic dataset under data/raw/"""
+    generate_synthetic_dataset()
+
+
+if __name__ == "__main__":
+    main()
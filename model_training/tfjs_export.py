@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+TensorFlow.js Export Helpers for Cattle Breed Identification
+Renames weight shards to content-hashed filenames, writes the precache
+manifest consumed by the PWA service worker (public/sw.js) and checks that
+an exported graph model reproduces the Keras model's outputs
+"""
+
+import hashlib
+import json
+from pathlib import Path
+
+import numpy as np
+
+PRECACHE_MANIFEST = 'precache-manifest.json'
+
+
+def content_hash(path, length=12):
+    """Short SHA-256 hex digest of a file's bytes"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:length]
+
+
+def hash_weight_shards(model_dir):
+    """Rename every shard in model.json to <stem>.<hash>.bin and rewrite the manifest.
+
+    Shards whose bytes did not change keep the same URL across retrains, so the
+    service worker only re-downloads shards that actually changed.
+    """
+    model_dir = Path(model_dir)
+    model_json_path = model_dir / 'model.json'
+
+    with open(model_json_path) as f:
+        model_json = json.load(f)
+
+    shard_names = []
+    for group in model_json['weightsManifest']:
+        hashed_paths = []
+        for shard in group['paths']:
+            shard_path = model_dir / shard
+            hashed_name = f"{shard_path.stem}.{content_hash(shard_path)}{shard_path.suffix}"
+            shard_path.replace(model_dir / hashed_name)
+            hashed_paths.append(hashed_name)
+        group['paths'] = hashed_paths
+        shard_names.extend(hashed_paths)
+
+    with open(model_json_path, 'w') as f:
+        json.dump(model_json, f, separators=(',', ':'))
+
+    return shard_names
+
+
+def write_precache_manifest(model_dir, public_path='/models', extra_files=('class_mapping.json',)):
+    """Write precache-manifest.json listing every file the client needs to load the model.
+
+    Hashed shards are marked immutable; model.json and metadata files carry a
+    revision hash. Shards come first so the service worker never caches a
+    model.json that points at shards it has not stored yet.
+    """
+    model_dir = Path(model_dir)
+    public_path = public_path.rstrip('/')
+
+    with open(model_dir / 'model.json') as f:
+        model_json = json.load(f)
+
+    entries = []
+    for group in model_json['weightsManifest']:
+        for shard in group['paths']:
+            entries.append({
+                'url': f"{public_path}/{shard}",
+                'revision': None,
+                'immutable': True,
+                'size': (model_dir / shard).stat().st_size
+            })
+
+    for name in [*extra_files, 'model.json']:
+        path = model_dir / name
+        if path.exists():
+            entries.append({
+                'url': f"{public_path}/{name}",
+                'revision': content_hash(path),
+                'immutable': False,
+                'size': path.stat().st_size
+            })
+
+    version = hashlib.sha256(
+        ''.join(e['url'] + (e['revision'] or '') for e in entries).encode()
+    ).hexdigest()[:12]
+
+    manifest = {
+        'version': version,
+        'format': model_json.get('format', 'graph-model'),
+        'total_bytes': sum(e['size'] for e in entries),
+        'entries': entries
+    }
+
+    with open(model_dir / PRECACHE_MANIFEST, 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    return manifest
+
+
+def _read_weights(model_dir, weights_manifest):
+    """Weight name -> array, decoded from the shards exactly as tfjs reads them"""
+    weights = {}
+    for group in weights_manifest:
+        data = b''.join((model_dir / shard).read_bytes() for shard in group['paths'])
+        offset = 0
+        for spec in group['weights']:
+            count = int(np.prod(spec['shape']))
+            quantization = spec.get('quantization')
+            dtype = np.dtype(quantization['dtype'] if quantization else spec['dtype'])
+            values = np.frombuffer(data, dtype, count, offset).reshape(spec['shape'])
+            offset += count * dtype.itemsize
+            if quantization and dtype != np.float16:
+                values = values * quantization['scale'] + quantization['min']
+            weights[spec['name']] = values.astype(spec['dtype'])
+    return weights
+
+
+def run_graph_model(model_dir, inputs):
+    """Run an exported tfjs graph model (model.json + shards) with TensorFlow.
+
+    The converter only emits ops that TensorFlow also registers, so the same
+    graph and weight bytes the browser downloads can be executed here.
+    """
+    import tensorflow as tf
+    from google.protobuf import json_format
+
+    model_dir = Path(model_dir)
+    with open(model_dir / 'model.json') as f:
+        model_json = json.load(f)
+
+    weights = _read_weights(model_dir, model_json['weightsManifest'])
+    graph_def = json_format.ParseDict(model_json['modelTopology'], tf.compat.v1.GraphDef())
+    for node in graph_def.node:
+        if node.name in weights:
+            node.attr['value'].tensor.CopyFrom(tf.make_tensor_proto(weights[node.name]))
+
+    signature = model_json['signature']
+    input_name = next(iter(signature['inputs'].values()))['name']
+    output_name = next(iter(signature['outputs'].values()))['name']
+    wrapped = tf.compat.v1.wrap_function(lambda: tf.graph_util.import_graph_def(graph_def, name=''), [])
+    run = wrapped.prune(wrapped.graph.as_graph_element(input_name), wrapped.graph.as_graph_element(output_name))
+    return run(tf.constant(inputs, tf.float32)).numpy()
+
+
+def verify_graph_model(model_dir, reference_model, image_size, batch_size=4, atol=1e-4):
+    """Compare the exported graph model with the Keras model on random 0-255 images.
+
+    Returns the largest absolute difference in output probabilities; raises
+    ValueError if it exceeds atol or any top-1 class differs.
+    """
+    sample = np.random.default_rng(0).integers(0, 256, (batch_size, *image_size, 3)).astype(np.float32)
+    expected = reference_model.predict(sample, verbose=0)
+    actual = run_graph_model(model_dir, sample)
+
+    max_diff = float(np.max(np.abs(expected - actual)))
+    if max_diff > atol or not np.array_equal(expected.argmax(axis=1), actual.argmax(axis=1)):
+        raise ValueError(f"tfjs graph model in {model_dir} does not match the Keras model "
+                         f"(max probability difference {max_diff:.2e})")
+    return max_diff
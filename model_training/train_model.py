@@ -20,9 +20,34 @@ from pathlib import Path
 import json
 import zipfile
 import requests
+import shutil
+import subprocess
+import tempfile
+import time
+from contextlib import nullcontext
 from PIL import Image
 import cv2
 
+from tfjs_export import hash_weight_shards, verify_graph_model, write_precache_manifest
+from embedding_index import build_reference_index
+from experiment_registry import ExperimentRegistry
+from gradient_accumulation import GradientAccumulationModel
+from pruning import choose_sparsity, sparsity_sweep
+from weight_store import DEFAULT_STORE_DIR, resolve_backbone_weights
+from onnx_export import export_onnx
+from cached_validation import CachedImageSet, ValidationTimer, validation_savings
+from shared_image_cache import CachedDirectoryIterator, SharedImageCache
+from fine_tuning import (
+    DEFAULT_FINE_TUNE_SCHEDULE, StepTimeCallback, count_trainable_params, unfreeze_top_blocks
+)
+from incremental_update import (
+    expand_classifier, load_class_order, release_frozen_columns, replay_dataframe
+)
+from hierarchical_model import (
+    CascadeClassifier, SpeciesLabelSequence, create_hierarchical_model,
+    evaluate_cascade, species_matrix
+)
+
 # Configuration
 CONFIG = {
     'model_name': 'bharat_pashudhan_cattle_classifier',
@@ -34,7 +59,49 @@ CONFIG = {
     'test_split': 0.1,
     'num_classes': 43,
     'early_stopping_patience': 10,
-    'reduce_lr_patience': 5
+    'reduce_lr_patience': 5,
+    'tfjs_output_dir': 'models/tfjs_model',
+    'tfjs_public_path': '/models',
+    'tfjs_shard_size_bytes': 4 * 1024 * 1024,
+    # Server-side similar-breed index; kept out of the served tfjs folder
+    'embedding_index_dir': 'models/embedding_index',
+    'hierarchical': False,
+    'gate_layer': 'block3b_add',
+    'gate_threshold': 0.9,
+    'early_exit_threshold': 0.6,
+    'species_loss_weight': 0.5,
+    # 'store' loads verified weights from the offline weight store; 'imagenet' downloads them
+    'backbone_weights': 'store',
+    'weight_store_dir': DEFAULT_STORE_DIR,
+    'input_dtype': 'uint8',
+    'tfjs_input_dtype': 'float32',
+    'class_mapping_path': 'data/processed/class_mapping.json',
+    'incremental_epochs': 5,
+    'incremental_learning_rate': 1e-4,
+    'replay_per_class': 20,
+    'freeze_old_classes': True,
+    'fine_tune_schedule': DEFAULT_FINE_TUNE_SCHEDULE,
+    'fine_tune_learning_rate': 0.0001,
+    'micro_batch_size': None,
+    'accumulation_steps': 1,
+    'pruning_sparsities': [0.25, 0.5],
+    'pruning_fine_tune_epochs': 2,
+    'pruning_learning_rate': 1e-5,
+    'pruning_max_accuracy_drop': 0.01,
+    'onnx_export': True,
+    'onnx_output_dir': 'models/onnx',
+    'onnx_quantize': True,
+    # Validation: decoded once into a uint8 cache (memory-mapped under validation_cache_dir,
+    # or in memory when it is None), run every validation_freq epochs on an optional
+    # stratified validation_subset fraction
+    'validation_cache': True,
+    'validation_cache_dir': 'cache/validation',
+    'validation_freq': 1,
+    'validation_subset': None,
+    # Host-wide decoded-image cache shared by concurrent trainers (None dir = /dev/shm)
+    'shared_image_cache': False,
+    'shared_image_cache_dir': None,
+    'shared_image_cache_bytes': 4 << 30
 }
 
 # Indian Cattle and Buffalo Breeds (43 total)
@@ -55,12 +122,43 @@ BREED_CLASSES = {
     ]
 }
 
+CONFIG['num_classes'] = sum(len(breeds) for breeds in BREED_CLASSES.values())
+
+def _leaf_layers(model):
+    """Layers with their own weights, flattening nested models in order"""
+    for layer in model.layers:
+        if hasattr(layer, 'layers'):
+            yield from _leaf_layers(layer)
+        else:
+            yield layer
+
 class CattleBreedTrainer:
     def __init__(self, config):
         self.config = config
         self.model = None
         self.history = None
         self.class_names = []
+        self.run = None
+        self.image_cache = None
+        
+    def track_experiment(self, registry_root='experiments', dataset_dir='data/processed'):
+        """Record this training run in the local experiment registry"""
+        self.run = ExperimentRegistry(registry_root).start_run(self.config, dataset_dir)
+        return self.run
+        
+    def _phase(self, name, images=None):
+        """Registry phase timer, or a no-op when the run isn't tracked"""
+        return self.run.phase(name, images) if self.run else nullcontext({'images': images})
+        
+    def _run_callbacks(self, phase):
+        return [self.run.keras_callback(phase, self.input_batch_size())] if self.run else []
+        
+    def input_batch_size(self):
+        """Images per generator batch: the micro-batch when accumulating gradients"""
+        steps = self.config.get('accumulation_steps', 1)
+        if steps <= 1:
+            return self.config['batch_size']
+        return self.config.get('micro_batch_size') or self.config['batch_size'] // steps
         
     def setup_directories(self):
         """Create necessary directories for training"""
@@ -99,13 +197,24 @@ class CattleBreedTrainer:
             print(f"# Extract to data/raw/{dataset['name'].lower().replace(' ', '_')}/")
             print()
             
+    def _flow_from_directory(self, datagen, directory, **kwargs):
+        """flow_from_directory, going through the shared decoded-image cache when enabled"""
+        if not self.config.get('shared_image_cache'):
+            return datagen.flow_from_directory(directory, **kwargs)
+        if self.image_cache is None:
+            self.image_cache = SharedImageCache(
+                self.config['shared_image_cache_dir'], self.config['shared_image_cache_bytes']
+            )
+        return CachedDirectoryIterator(directory, datagen, image_cache=self.image_cache,
+                                       dtype=datagen.dtype, **kwargs)
+        
     def preprocess_images(self, data_dir):
         """Preprocess and organize images for training"""
         print("Preprocessing images...")
         
-        # Create data generators with augmentation
+        # Create data generators with augmentation. Batches stay uint8 (raw 0-255
+        # pixels); the cast to float happens inside the model.
         train_datagen = ImageDataGenerator(
-            rescale=1./255,
             rotation_range=20,
             width_shift_range=0.2,
             height_shift_range=0.2,
@@ -113,42 +222,66 @@ class CattleBreedTrainer:
             zoom_range=0.2,
             shear_range=0.2,
             fill_mode='nearest',
-            validation_split=self.config['validation_split']
+            validation_split=self.config['validation_split'],
+            dtype=self.config['input_dtype']
         )
         
-        test_datagen = ImageDataGenerator(rescale=1./255)
+        # Same validation_split (so the same files), but never augmented
+        validation_datagen = ImageDataGenerator(
+            validation_split=self.config['validation_split'],
+            dtype=self.config['input_dtype']
+        )
+        
+        # Keep class ids stable across dataset growth (None = alphabetical folders)
+        classes = load_class_order(self.config['class_mapping_path'])
         
         # Load training data
-        train_generator = train_datagen.flow_from_directory(
+        train_generator = self._flow_from_directory(
+            train_datagen,
             data_dir,
             target_size=self.config['image_size'],
-            batch_size=self.config['batch_size'],
+            batch_size=self.input_batch_size(),
             class_mode='categorical',
             subset='training',
-            shuffle=True
+            shuffle=True,
+            classes=classes
         )
         
         # Load validation data
-        validation_generator = train_datagen.flow_from_directory(
+        validation_generator = self._flow_from_directory(
+            validation_datagen,
             data_dir,
             target_size=self.config['image_size'],
-            batch_size=self.config['batch_size'],
+            batch_size=self.input_batch_size(),
             class_mode='categorical',
             subset='validation',
-            shuffle=False
+            shuffle=False,
+            classes=classes
         )
         
+        if self.config.get('validation_cache'):
+            validation_generator = CachedImageSet.from_directory_iterator(
+                validation_generator, cache_dir=self.config['validation_cache_dir']
+            )
+        
         self.class_names = list(train_generator.class_indices.keys())
         
         return train_generator, validation_generator
         
-    def create_model(self):
-        """Create EfficientNet-based model for cattle breed classification"""
-        print("Creating model architecture...")
+    def build_model(self, input_dtype=None, weights='default'):
+        """Build the (uncompiled) flat or hierarchical architecture"""
+        input_dtype = input_dtype or self.config['input_dtype']
+        if weights == 'default':
+            weights = self.config['backbone_weights']
+        weights = resolve_backbone_weights(weights, 'efficientnetb0_notop', self.config['weight_store_dir'])
         
+        if self.config.get('hierarchical'):
+            class_names = self.class_names or sorted(b for breeds in BREED_CLASSES.values() for b in breeds)
+            return create_hierarchical_model(self.config, class_names, BREED_CLASSES, input_dtype, weights)
+            
         # Load pre-trained EfficientNetB0
         base_model = EfficientNetB0(
-            weights='imagenet',
+            weights=weights,
             include_top=False,
             input_shape=(*self.config['image_size'], 3)
         )
@@ -157,7 +290,10 @@ class CattleBreedTrainer:
         base_model.trainable = False
         
         # Add custom classification head
-        model = keras.Sequential([
+        return keras.Sequential([
+            keras.Input(shape=(*self.config['image_size'], 3), dtype=input_dtype),
+            # Raw pixels in; EfficientNet normalizes 0-255 input itself, so only cast
+            layers.Rescaling(1.0, name='pixel_cast'),
             base_model,
             layers.GlobalAveragePooling2D(),
             layers.Dropout(0.3),
@@ -168,26 +304,115 @@ class CattleBreedTrainer:
             layers.BatchNormalization(),
             layers.Dropout(0.3),
             layers.Dense(self.config['num_classes'], activation='softmax', name='predictions')
-        ])
+        ], name=self.config['model_name'])
+        
+    def create_model(self):
+        """Create EfficientNet-based model for cattle breed classification"""
+        if self.config.get('hierarchical'):
+            return self.create_hierarchical_model()
+            
+        print("Creating model architecture...")
+        
+        model = self.with_accumulation(self.build_model())
         
         # Compile model
-        model.compile(
-            optimizer=keras.optimizers.Adam(learning_rate=self.config['learning_rate']),
-            loss='categorical_crossentropy',
-            metrics=['accuracy', 'top_5_accuracy']
-        )
+        self.compile_model(model, self.config['learning_rate'])
+        
+        self.model = model
+        return model
+        
+    def create_hierarchical_model(self):
+        """Create species-gated model with separate cattle and buffalo heads"""
+        print("Creating hierarchical cattle/buffalo model...")
+        
+        model = self.with_accumulation(self.build_model())
+        self.compile_model(model, self.config['learning_rate'])
         
         self.model = model
         return model
         
+    def with_accumulation(self, model):
+        """Wrap model for gradient accumulation when accumulation_steps > 1"""
+        steps = self.config.get('accumulation_steps', 1)
+        if steps <= 1:
+            return model
+        print(f"Gradient accumulation: {steps} micro-batches of {self.input_batch_size()} "
+              f"per update (effective batch {self.input_batch_size() * steps})")
+        return GradientAccumulationModel.wrap(model, steps)
+        
+    def compile_model(self, model, learning_rate):
+        """Compile flat or hierarchical model with matching losses and metrics"""
+        optimizer = keras.optimizers.Adam(learning_rate=learning_rate)
+        # Keras has no 'top_5_accuracy' string alias; the name keeps the history keys
+        top_5 = keras.metrics.TopKCategoricalAccuracy(k=5, name='top_5_accuracy')
+        
+        if self.config.get('hierarchical'):
+            model.compile(
+                optimizer=optimizer,
+                loss=['categorical_crossentropy', 'categorical_crossentropy'],
+                loss_weights=[1.0, self.config['species_loss_weight']],
+                metrics=[['accuracy', top_5], ['accuracy']]
+            )
+        else:
+            model.compile(
+                optimizer=optimizer,
+                loss='categorical_crossentropy',
+                metrics=['accuracy', top_5]
+            )
+            
+    def checkpoint_path(self):
+        """Best-checkpoint path; hierarchical runs keep their own so the flat baseline survives"""
+        suffix = '_hierarchical' if self.config.get('hierarchical') else ''
+        return f"models/{self.config['model_name']}{suffix}_best.h5"
+        
+    def inference_model(self, input_dtype=None):
+        """Single-output model (breed probabilities) used for export.
+        
+        With a different input_dtype the trained layers are placed behind a new
+        input layer (the hierarchical model is rebuilt and its weights copied).
+        """
+        model = self.model
+        same_dtype = not input_dtype or tf.as_dtype(input_dtype) == tf.as_dtype(model.inputs[0].dtype)
+        
+        if self.config.get('hierarchical'):
+            if not same_dtype:
+                model = self.build_model(input_dtype=input_dtype, weights=None)
+                for src, dst in zip(_leaf_layers(self.model), _leaf_layers(model)):
+                    dst.set_weights(src.get_weights())
+            return keras.Model(model.input, model.outputs[0], name=self.config['model_name'])
+            
+        if same_dtype:
+            return model
+        # Flat models may have been pruned, so reuse the trained layers rather than rebuilding
+        body = [layer for layer in model.layers if not isinstance(layer, layers.InputLayer)]
+        return keras.Sequential(
+            [keras.Input(shape=model.input_shape[1:], dtype=input_dtype), *body],
+            name=self.config['model_name']
+        )
+        
     def train_model(self, train_generator, validation_generator):
         """Train the cattle breed classification model"""
         print("Starting model training...")
         
+        full_validation = validation_generator
+        if self.config.get('validation_subset') and isinstance(validation_generator, CachedImageSet):
+            validation_generator = validation_generator.stratified_subset(self.config['validation_subset'])
+            print(f"Validating on a stratified {validation_generator.samples}-image subset")
+        fit_validation = validation_generator
+            
+        if self.config.get('hierarchical'):
+            matrix = species_matrix(self.class_names, BREED_CLASSES)
+            train_generator = SpeciesLabelSequence(train_generator, matrix)
+            validation_generator = SpeciesLabelSequence(validation_generator, matrix)
+            
+        # Multi-output models prefix metrics with the output name
+        monitor = 'val_predictions_accuracy' if self.config.get('hierarchical') else 'val_accuracy'
+        self.validation_timer = ValidationTimer()
+        
         # Callbacks
         callbacks = [
             keras.callbacks.EarlyStopping(
-                monitor='val_accuracy',
+                monitor=monitor,
                 patience=self.config['early_stopping_patience'],
                 restore_best_weights=True
             ),
@@ -198,55 +423,257 @@ class CattleBreedTrainer:
                 min_lr=1e-7
             ),
             keras.callbacks.ModelCheckpoint(
-                f"models/{self.config['model_name']}_best.h5",
-                monitor='val_accuracy',
+                self.checkpoint_path(),
+                monitor=monitor,
                 save_best_only=True,
                 save_weights_only=False
             ),
-            keras.callbacks.CSVLogger(f"logs/training_log.csv")
+            keras.callbacks.CSVLogger(f"logs/training_log.csv"),
+            self.validation_timer
         ]
         
         # Train model
-        self.history = self.model.fit(
-            train_generator,
-            epochs=self.config['epochs'],
-            validation_data=validation_generator,
-            callbacks=callbacks,
-            verbose=1
-        )
+        with self._phase('head') as stats:
+            self.history = self.model.fit(
+                train_generator,
+                epochs=self.config['epochs'],
+                validation_data=validation_generator,
+                validation_freq=self.config['validation_freq'],
+                callbacks=callbacks + self._run_callbacks('head'),
+                verbose=1
+            )
+            stats['images'] = len(train_generator) * self.input_batch_size() * len(self.history.epoch)
         
         # Fine-tuning phase
+        self.fine_tune(train_generator, validation_generator, callbacks)
+        
+        epochs = len(self.history.epoch) + sum(row['epochs'] for row in self.fine_tune_report)
+        self.validation_report = validation_savings(
+            full_validation, fit_validation, self.validation_timer.seconds, epochs
+        )
+        with open('results/validation_cache.json', 'w') as f:
+            json.dump(self.validation_report, f, indent=2)
+        if self.validation_report.get('seconds_saved_per_epoch') is not None:
+            print(f"Validation: {self.validation_report['cached_seconds_per_epoch']:.1f}s/epoch, "
+                  f"~{self.validation_report['seconds_saved_per_epoch']:.1f}s/epoch saved vs re-decoding")
+        
+        if self.image_cache:
+            cache_stats = self.image_cache.stats()
+            with open('results/image_cache_stats.json', 'w') as f:
+                json.dump(cache_stats, f, indent=2)
+            print(f"Shared image cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, "
+                  f"{cache_stats['evictions']} evictions, {cache_stats['cache_bytes'] / 1e6:.0f} MB")
+            if self.run:
+                self.run.log_metrics({
+                    'image_cache_hit_rate': cache_stats['hit_rate'],
+                    'image_cache_evictions': cache_stats['evictions']
+                })
+        
+    def fine_tune(self, train_generator, validation_generator, callbacks):
+        """Unfreeze backbone blocks from the top down, one schedule stage at a time"""
         print("Starting fine-tuning...")
         
-        # Unfreeze top layers of base model
-        self.model.layers[0].trainable = True
+        monitor = 'val_predictions_accuracy' if self.config.get('hierarchical') else 'val_accuracy'
+        epoch = self.history.epoch[-1] + 1
+        self.fine_tune_report = []
+        
+        for i, stage in enumerate(self.config['fine_tune_schedule']):
+            # Recompile only at stage boundaries, after changing trainable flags
+            unfreeze_top_blocks(self.model, stage['blocks'])
+            learning_rate = stage.get('learning_rate', self.config['fine_tune_learning_rate'])
+            self.compile_model(self.model, learning_rate)
+            
+            trainable_params = count_trainable_params(self.model)
+            print(f"Fine-tune stage {i + 1}: top {stage['blocks']} block(s), "
+                  f"{trainable_params:,} trainable parameters, lr {learning_rate:g}")
+            
+            step_timer = StepTimeCallback()
+            start = time.perf_counter()
+            with self._phase(f"fine_tune_{i + 1}") as stats:
+                self.history_fine = self.model.fit(
+                    train_generator,
+                    epochs=epoch + stage['epochs'],
+                    initial_epoch=epoch,
+                    validation_data=validation_generator,
+                    validation_freq=self.config['validation_freq'],
+                    callbacks=callbacks + [step_timer] + self._run_callbacks(f"fine_tune_{i + 1}"),
+                    verbose=1
+                )
+                stats['images'] = len(train_generator) * self.input_batch_size() * len(self.history_fine.epoch)
+                
+            epochs_run = len(self.history_fine.epoch)
+            epoch += epochs_run
+            self.fine_tune_report.append({
+                'stage': i + 1,
+                'blocks': stage['blocks'],
+                'learning_rate': learning_rate,
+                'trainable_params': trainable_params,
+                'epochs': epochs_run,
+                'seconds': time.perf_counter() - start,
+                'mean_step_ms': step_timer.mean_step_ms(),
+                'best_val_accuracy': max(self.history_fine.history.get(monitor, [0.0]))
+            })
+            
+        with open('results/fine_tune_stages.json', 'w') as f:
+            json.dump(self.fine_tune_report, f, indent=2)
+            
+        print("\nFine-tune stages:")
+        for row in self.fine_tune_report:
+            print(f"  stage {row['stage']}: {row['trainable_params']:>10,} params, "
+                  f"{row['mean_step_ms'] or 0:.0f} ms/step, {row['seconds']:.0f}s, "
+                  f"val acc {row['best_val_accuracy']:.4f}")
+                  
+    def incremental_update(self, checkpoint_path=None, processed_dir='data/processed'):
+        """Add newly mapped breeds to a trained model without a full retrain"""
+        print("Starting incremental class update...")
+        
+        processed_dir = Path(processed_dir)
+        class_names = load_class_order(self.config['class_mapping_path'])
+        if class_names is None:
+            raise FileNotFoundError(
+                f"{self.config['class_mapping_path']} not found; run data_preparation.py first"
+            )
+            
+        checkpoint_path = checkpoint_path or self.checkpoint_path()
+        old_model = keras.models.load_model(checkpoint_path)
+        old_classes = old_model.output_shape[-1]
+        new_classes = class_names[old_classes:]
+        
+        if not new_classes:
+            print("No new breeds in class mapping; model is up to date")
+            self.model = old_model
+            self.class_names = class_names
+            return None
+            
+        print(f"Adding {len(new_classes)} breed(s) to a {old_classes}-class model: {', '.join(new_classes)}")
+        
+        self.model = self.with_accumulation(
+            expand_classifier(old_model, len(class_names), self.config['freeze_old_classes'])
+        )
+        self.class_names = class_names
+        self.config['num_classes'] = len(class_names)
+        self.compile_model(self.model, self.config['incremental_learning_rate'])
         
-        # Use lower learning rate for fine-tuning
-        self.model.compile(
-            optimizer=keras.optimizers.Adam(learning_rate=self.config['learning_rate']/10),
-            loss='categorical_crossentropy',
-            metrics=['accuracy', 'top_5_accuracy']
+        # New classes in full plus a small replay buffer of old ones
+        train_df = replay_dataframe(
+            processed_dir / 'train', class_names, set(new_classes), self.config['replay_per_class']
+        )
+        train_datagen = ImageDataGenerator(
+            rotation_range=20,
+            width_shift_range=0.2,
+            height_shift_range=0.2,
+            horizontal_flip=True,
+            zoom_range=0.2,
+            fill_mode='nearest',
+            dtype=self.config['input_dtype']
+        )
+        train_generator = train_datagen.flow_from_dataframe(
+            train_df,
+            target_size=self.config['image_size'],
+            batch_size=self.input_batch_size(),
+            class_mode='categorical',
+            classes=class_names,
+            shuffle=True
+        )
+        validation_generator = ImageDataGenerator(dtype=self.config['input_dtype']).flow_from_directory(
+            processed_dir / 'validation',
+            target_size=self.config['image_size'],
+            batch_size=self.input_batch_size(),
+            class_mode='categorical',
+            classes=class_names,
+            shuffle=False
         )
         
-        # Continue training with fine-tuning
-        fine_tune_epochs = 20
-        total_epochs = self.config['epochs'] + fine_tune_epochs
+        # Constrained layers can't be reloaded without custom objects, so keep weights only
+        weights_path = f"models/{self.config['model_name']}_incremental.weights.h5"
+        callbacks = [
+            keras.callbacks.EarlyStopping(
+                monitor='val_accuracy',
+                patience=self.config['early_stopping_patience'],
+                restore_best_weights=True
+            ),
+            keras.callbacks.ModelCheckpoint(
+                weights_path,
+                monitor='val_accuracy',
+                save_best_only=True,
+                save_weights_only=True
+            ),
+            keras.callbacks.CSVLogger("logs/incremental_log.csv")
+        ]
         
-        self.history_fine = self.model.fit(
+        self.history = self.model.fit(
             train_generator,
-            epochs=total_epochs,
-            initial_epoch=self.history.epoch[-1],
+            epochs=self.config['incremental_epochs'],
             validation_data=validation_generator,
             callbacks=callbacks,
             verbose=1
         )
         
+        release_frozen_columns(self.model)
+        self.model.save(checkpoint_path)
+        
+        # Rough cost relative to the full schedule (head epochs + fine-tune stages over all images)
+        full_images = sum(1 for _ in (processed_dir / 'train').rglob('*.jpg'))
+        fine_tune_epochs = sum(stage['epochs'] for stage in self.config['fine_tune_schedule'])
+        full_cost = full_images * (self.config['epochs'] + fine_tune_epochs)
+        incremental_cost = len(train_df) * len(self.history.epoch)
+        summary = {
+            'old_classes': old_classes,
+            'new_classes': new_classes,
+            'train_images': len(train_df),
+            'epochs': len(self.history.epoch),
+            'val_accuracy': max(self.history.history['val_accuracy']),
+            'cost_vs_full_retrain': incremental_cost / full_cost if full_cost else None
+        }
+        print(f"Incremental update done: {summary['train_images']} images x {summary['epochs']} epochs "
+              f"(~{summary['cost_vs_full_retrain']:.1%} of a full retrain), "
+              f"val accuracy {summary['val_accuracy']:.4f}")
+        
+        return summary
+        
+    def prune_model(self, train_generator, validation_generator):
+        """Structured pruning sweep; keeps the sparsest model within the accuracy budget"""
+        if self.config.get('hierarchical'):
+            raise ValueError("Structured pruning supports the flat model only")
+            
+        print("Structured pruning sweep...")
+        with self._phase('pruning'):
+            report, models = sparsity_sweep(
+                self,
+                train_generator,
+                validation_generator,
+                self.config['pruning_sparsities'],
+                fine_tune_epochs=self.config['pruning_fine_tune_epochs'],
+                learning_rate=self.config['pruning_learning_rate']
+            )
+            
+        chosen = choose_sparsity(report, self.config['pruning_max_accuracy_drop'])
+        self.model = models[chosen]
+        self.pruning_report = {'chosen_sparsity': chosen, 'levels': report}
+        
+        with open('results/pruning_report.json', 'w') as f:
+            json.dump(self.pruning_report, f, indent=2)
+            
+        if self.run:
+            row = next(r for r in report if r['sparsity'] == chosen)
+            self.run.log_metrics({
+                'pruning_sparsity': chosen,
+                'pruned_flops': row['flops'],
+                'pruned_params': row['params'],
+                'pruned_cpu_latency_ms': row['cpu_latency_ms'],
+                'pruned_accuracy': row['accuracy']
+            })
+            
+        print(f"Keeping sparsity {chosen:.2f} "
+              f"(max accuracy drop {self.config['pruning_max_accuracy_drop']:.3f})")
+        return self.pruning_report
+        
     def evaluate_model(self, validation_generator):
         """Evaluate model performance"""
         print("Evaluating model...")
         
         # Get predictions
-        predictions = self.model.predict(validation_generator)
+        predictions = self.inference_model().predict(validation_generator)
         predicted_classes = np.argmax(predictions, axis=1)
         true_classes = validation_generator.classes
         
@@ -262,6 +689,13 @@ class CattleBreedTrainer:
         with open('results/classification_report.json', 'w') as f:
             json.dump(report, f, indent=2)
             
+        if self.run:
+            self.run.log_metrics({
+                'accuracy': report['accuracy'],
+                'macro_f1': report['macro avg']['f1-score'],
+                'weighted_f1': report['weighted avg']['f1-score']
+            })
+            
         # Confusion matrix
         cm = confusion_matrix(true_classes, predicted_classes)
         
@@ -324,28 +758,55 @@ class CattleBreedTrainer:
         plt.close()
         
     def convert_to_tensorflowjs(self):
-        """Convert trained model to TensorFlow.js format"""
+        """Convert trained model to the TensorFlow.js graph format loaded by the app"""
         print("Converting model to TensorFlow.js format...")
         
-        # Save model in SavedModel format first
-        self.model.save('models/cattle_breed_model')
-        
-        # Convert to TensorFlow.js (requires tensorflowjs package)
-        os.system(f"""
-        tensorflowjs_converter \
-            --input_format=tf_saved_model \
-            --output_format=tfjs_graph_model \
-            --signature_name=serving_default \
-            --saved_model_tags=serve \
-            models/cattle_breed_model \
-            models/tfjs_model
-        """)
-        
+        output_dir = Path(self.config['tfjs_output_dir'])
+        
+        export_model = self.inference_model()
+        
+        # Save model in SavedModel format for server-side use
+        export_model.save('models/cattle_breed_model')
+        
+        # tfjs has no uint8 tensors; the browser feeds raw 0-255 pixels as float32.
+        keras_path = 'models/cattle_breed_model.h5'
+        tfjs_model = self.inference_model(self.config['tfjs_input_dtype'])
+        tfjs_model.save(keras_path)
+        
+        # Start from an empty directory so stale shards never end up in the manifest
+        if output_dir.exists():
+            shutil.rmtree(output_dir)
+        output_dir.mkdir(parents=True)
+        
+        # A graph model is plain TF ops, which the converter checks against the
+        # ops tfjs implements; a layers model would need every Keras layer class
+        # (Normalization, Rescaling, ...) to exist in tfjs-layers
+        with tempfile.TemporaryDirectory() as saved_model_dir:
+            tfjs_model.save(saved_model_dir, save_format='tf')
+            subprocess.run([
+                'tensorflowjs_converter',
+                '--input_format=tf_saved_model',
+                '--output_format=tfjs_graph_model',
+                '--signature_name=serving_default',
+                '--saved_model_tags=serve',
+                f"--weight_shard_size_bytes={self.config['tfjs_shard_size_bytes']}",
+                saved_model_dir,
+                str(output_dir)
+            ], check=True)
+            
         # Save class names for JavaScript
         class_mapping = {
             'classes': self.class_names,
             'num_classes': len(self.class_names),
             'input_shape': [None, *self.config['image_size'], 3],
+            'input_dtype': self.config['tfjs_input_dtype'],
+            'input_range': [0, 255],
+            'model_format': 'graph-model',
+            'breed_types': {
+                breed: breed_type
+                for breed_type, breeds in BREED_CLASSES.items()
+                for breed in breeds
+            },
             'model_info': {
                 'name': self.config['model_name'],
                 'version': '1.0.0',
@@ -353,10 +814,89 @@ class CattleBreedTrainer:
             }
         }
         
-        with open('models/tfjs_model/class_mapping.json', 'w') as f:
+        with open(output_dir / 'class_mapping.json', 'w') as f:
             json.dump(class_mapping, f, indent=2)
             
-        print("TensorFlow.js model saved to models/tfjs_model/")
+        # Content-hashed shard names + precache manifest for the service worker.
+        # The renamed files are checked against Keras first, so a model the
+        # browser can't reproduce never reaches the manifest.
+        shards = hash_weight_shards(output_dir)
+        max_diff = verify_graph_model(output_dir, tfjs_model, self.config['image_size'])
+        manifest = write_precache_manifest(output_dir, public_path=self.config['tfjs_public_path'])
+        
+        print(f"TensorFlow.js model saved to {output_dir}/ "
+              f"({len(shards)} shards, {manifest['total_bytes'] / 1e6:.1f} MB, version {manifest['version']}, "
+              f"max difference vs Keras {max_diff:.1e})")
+        
+        if self.run:
+            self.run.log_artifact('tfjs_model', output_dir)
+            self.run.log_artifact('saved_model', 'models/cattle_breed_model')
+            self.run.log_artifact('keras_model', keras_path)
+            self.run.log_metrics({'tfjs_bytes': manifest['total_bytes'], 'tfjs_shards': len(shards)})
+            
+        if self.config.get('onnx_export'):
+            self.convert_to_onnx(export_model, class_mapping)
+            
+    def convert_to_onnx(self, export_model, class_mapping):
+        """ONNX export for server-side CPU inference (uint8 input, same class mapping)"""
+        print("Converting model to ONNX...")
+        try:
+            paths = export_onnx(
+                export_model,
+                self.config['onnx_output_dir'],
+                {**class_mapping, 'input_dtype': export_model.inputs[0].dtype.name},
+                quantize=self.config['onnx_quantize']
+            )
+        except ImportError as e:
+            print(f"⚠️ Skipping ONNX export ({e}); install the ONNX packages from requirements.txt")
+            return None
+            
+        if self.run:
+            self.run.log_artifact('onnx_model', self.config['onnx_output_dir'])
+            self.run.log_metrics({
+                f"onnx_{name}_bytes": Path(path).stat().st_size for name, path in paths.items()
+            })
+        return paths
+        
+    def evaluate_hierarchical(self, validation_generator, flat_model_path=None):
+        """Compare cascade accuracy, FLOPs and latency per image against the flat model"""
+        print("Evaluating hierarchical cascade...")
+        
+        flat_model_path = flat_model_path or f"models/{self.config['model_name']}_best.h5"
+        flat_model = keras.models.load_model(flat_model_path)
+        
+        cascade = CascadeClassifier(
+            self.model,
+            self.class_names,
+            BREED_CLASSES,
+            self.config['gate_layer'],
+            gate_threshold=self.config['gate_threshold'],
+            early_exit_threshold=self.config['early_exit_threshold']
+        )
+        species_of_class = species_matrix(self.class_names, BREED_CLASSES).argmax(axis=1)
+        report = evaluate_cascade(cascade, flat_model, validation_generator, species_of_class)
+        
+        with open('results/hierarchical_comparison.json', 'w') as f:
+            json.dump(report, f, indent=2)
+            
+        flat, hier = report['flat'], report['cascade']
+        print(f"Flat:    accuracy {flat['accuracy']:.4f}, {flat['flops_per_image'] / 1e9:.3f} GFLOPs/image, "
+              f"{flat['single_image_latency_ms']:.1f} ms/image")
+        print(f"Cascade: accuracy {hier['accuracy']:.4f}, {hier['flops_per_image'] / 1e9:.3f} GFLOPs/image, "
+              f"{hier['single_image_latency_ms']:.1f} ms/image, early exit {hier['early_exit_rate']:.1%}")
+        
+        return report
+        
+    def export_embedding_index(self, processed_dir='data/processed'):
+        """Build the server-side visual-search embedding index"""
+        print("Building similar-breed embedding index...")
+        _, benchmark = build_reference_index(
+            self.model,
+            processed_dir,
+            self.config['embedding_index_dir'],
+            image_size=self.config['image_size']
+        )
+        return benchmark
         
     def save_model_info(self):
         """Save model information and metadata"""
@@ -372,6 +912,21 @@ class CattleBreedTrainer:
         
         with open('models/model_info.json', 'w') as f:
             json.dump(model_info, f, indent=2)
+            
+    def finish_experiment(self, status='completed'):
+        """Snapshot logs and results into the run directory and close the run"""
+        if not self.run:
+            return
+            
+        for path in ['logs/training_log.csv', 'models/model_info.json', *Path('results').glob('*.json')]:
+            if Path(path).exists():
+                self.run.log_artifact(Path(path).stem, path, snapshot=True)
+                
+        monitor = 'val_predictions_accuracy' if self.config.get('hierarchical') else 'val_accuracy'
+        histories = [h for h in (self.history, getattr(self, 'history_fine', None)) if h is not None]
+        best = max((max(h.history.get(monitor, [0.0])) for h in histories), default=None)
+        
+        self.run.finish(status, {'best_val_accuracy': best, 'params': self.model.count_params() if self.model else None})
 
 def main():
     """Main training pipeline"""
@@ -392,6 +947,9 @@ def main():
     
     # Uncomment below after data preparation
     """
+    # Record this run in the local experiment registry
+    trainer.track_experiment()
+    
     # Preprocess data
     train_gen, val_gen = trainer.preprocess_images('data/processed')
     
@@ -409,11 +967,18 @@ def main():
     # Plot training history
     trainer.plot_training_history()
     
+    # Optional: prune channels and dense units before export
+    # trainer.prune_model(train_gen, val_gen)
+    
     # Convert to TensorFlow.js
     trainer.convert_to_tensorflowjs()
     
+    # Build visual search index
+    trainer.export_embedding_index()
+    
     # Save model info
     trainer.save_model_info()
+    trainer.finish_experiment()
     
     print("✅ Training completed successfully!")
     print("📁 Check the following directories:")
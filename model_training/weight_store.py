@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Offline Backbone Weight Store for Cattle Breed Identification
+Pre-seeded, checksummed pretrained weights looked up by architecture name, so
+training nodes never download ImageNet weights and fail fast when they are
+missing. The store is written once and then only read, so one directory can
+be mounted read-only into every worker and container
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+DEFAULT_STORE_DIR = os.environ.get('BACKBONE_WEIGHT_STORE', 'weight_store')
+
+
+def _efficientnetb0_notop():
+    from tensorflow.keras.applications import EfficientNetB0
+    return EfficientNetB0(weights='imagenet', include_top=False)
+
+
+# Architecture name -> builder that downloads the reference weights (seeding only)
+ARCHITECTURES = {
+    'efficientnetb0_notop': _efficientnetb0_notop
+}
+
+
+class MissingWeightsError(FileNotFoundError):
+    """Raised when an architecture has not been seeded into the store"""
+
+
+class WeightChecksumError(ValueError):
+    """Raised when a stored weight file does not match its recorded checksum"""
+
+
+def sha256_file(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class WeightStore:
+    """Directory of <architecture>.h5 files plus manifest.json with their SHA-256"""
+
+    def __init__(self, root=DEFAULT_STORE_DIR):
+        self.root = Path(root)
+        self.manifest_path = self.root / 'manifest.json'
+        self._verified = set()
+
+    def manifest(self):
+        if not self.manifest_path.exists():
+            return {}
+        with open(self.manifest_path) as f:
+            return json.load(f)
+
+    def path(self, architecture, verify=True):
+        """Local weight file for architecture; raises instead of ever downloading"""
+        entry = self.manifest().get(architecture)
+        if entry is None:
+            raise MissingWeightsError(
+                f"No '{architecture}' weights in {self.root.resolve()}. Seed the store once on a "
+                f"connected machine with `python weight_store.py seed {architecture} --store {self.root}` "
+                f"(or `--from-file <h5>`), then copy or mount it, or set BACKBONE_WEIGHT_STORE."
+            )
+        weight_path = self.root / entry['file']
+        if not weight_path.exists():
+            raise MissingWeightsError(f"{weight_path} is listed in {self.manifest_path} but missing")
+
+        if verify and architecture not in self._verified:
+            actual = sha256_file(weight_path)
+            if actual != entry['sha256']:
+                raise WeightChecksumError(
+                    f"{weight_path} has SHA-256 {actual[:12]}..., expected {entry['sha256'][:12]}...; "
+                    f"re-seed the store"
+                )
+            self._verified.add(architecture)
+        return weight_path
+
+    def seed(self, architecture, source_file=None, expected_sha256=None):
+        """Add weights for architecture from source_file, or download them once via Keras"""
+        self.root.mkdir(parents=True, exist_ok=True)
+        with tempfile.TemporaryDirectory(dir=self.root) as tmp:
+            staged = Path(tmp) / f"{architecture}.h5"
+            if source_file:
+                shutil.copyfile(source_file, staged)
+            else:
+                if architecture not in ARCHITECTURES:
+                    raise KeyError(f"Unknown architecture '{architecture}'; pass --from-file")
+                ARCHITECTURES[architecture]().save_weights(staged)
+
+            checksum = sha256_file(staged)
+            if expected_sha256 and checksum != expected_sha256:
+                raise WeightChecksumError(f"{source_file or architecture} has SHA-256 {checksum}, "
+                                          f"expected {expected_sha256}")
+
+            # Rename into place so concurrent readers never see a partial file
+            dest = self.root / f"{architecture}.h5"
+            os.replace(staged, dest)
+        os.chmod(dest, 0o444)
+
+        manifest = self.manifest()
+        manifest[architecture] = {
+            'file': dest.name,
+            'sha256': checksum,
+            'bytes': dest.stat().st_size,
+            'source': str(source_file) if source_file else 'keras.applications (imagenet)',
+            'seeded_at': time.strftime('%Y-%m-%dT%H:%M:%S')
+        }
+        staged_manifest = self.manifest_path.with_suffix('.json.tmp')
+        with open(staged_manifest, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(staged_manifest, self.manifest_path)
+
+        print(f"Seeded {architecture}: {dest} ({dest.stat().st_size / 1e6:.1f} MB, sha256 {checksum[:12]})")
+        return dest
+
+    def verify_all(self):
+        """Architecture -> True/False for every manifest entry"""
+        results = {}
+        for architecture in self.manifest():
+            try:
+                self.path(architecture)
+                results[architecture] = True
+            except (MissingWeightsError, WeightChecksumError) as e:
+                print(f"  {e}")
+                results[architecture] = False
+        return results
+
+
+def resolve_backbone_weights(weights, architecture, store_dir=DEFAULT_STORE_DIR):
+    """Map the backbone_weights setting to what keras.applications accepts.
+
+    'store' resolves to the verified local file; 'imagenet' (download), None
+    and explicit file paths pass through unchanged.
+    """
+    if weights != 'store':
+        return weights
+    return str(WeightStore(store_dir).path(architecture))
+
+
+def main():
+    """Command-line interface: seed, list and verify"""
+    parser = argparse.ArgumentParser(description="Manage the offline backbone weight store")
+    parser.add_argument('--store', default=DEFAULT_STORE_DIR)
+    sub = parser.add_subparsers(dest='command', required=True)
+    seed = sub.add_parser('seed')
+    seed.add_argument('architecture')
+    seed.add_argument('--from-file', default=None, help="Copy an existing .h5 instead of downloading")
+    seed.add_argument('--sha256', default=None, help="Expected checksum of the weights")
+    sub.add_parser('list')
+    sub.add_parser('verify')
+    args = parser.parse_args()
+
+    store = WeightStore(args.store)
+
+    if args.command == 'seed':
+        store.seed(args.architecture, args.from_file, args.sha256)
+    elif args.command == 'list':
+        for architecture, entry in store.manifest().items():
+            print(f"{architecture:<24} {entry['bytes'] / 1e6:7.1f} MB  sha256 {entry['sha256'][:12]}  "
+                  f"{entry['seeded_at']}  {entry['source']}")
+    elif args.command == 'verify':
+        results = store.verify_all()
+        for architecture, ok in results.items():
+            print(f"{architecture:<24} {'ok' if ok else 'FAILED'}")
+        if not all(results.values()):
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,12 @@ const CACHE_NAME = 'cattle-breed-identification-v1.0.0';
 const STATIC_CACHE = 'static-cache-v1';
 const DYNAMIC_CACHE = 'dynamic-cache-v1';
 const API_CACHE = 'api-cache-v1';
+const MODEL_CACHE = 'model-cache-v1';
+
+// Written by the training pipeline next to model.json; shards are content-hashed
+const MODEL_MANIFEST_URL = '/models/precache-manifest.json';
+const MODEL_SYNC_INTERVAL = 60 * 60 * 1000; // 1 hour
+let lastModelSync = 0;
 
 // Files to cache immediately
 const STATIC_FILES = [
@@ -33,6 +39,11 @@ self.addEventListener('install', (event) => {
       })
       .then(() => {
         console.log('Service Worker: Static files cached');
+        return syncModelCache().catch((error) => {
+          console.log('Service Worker: Model precache skipped:', error);
+        });
+      })
+      .then(() => {
         return self.skipWaiting();
       })
       .catch((error) => {
@@ -51,7 +62,8 @@ self.addEventListener('activate', (event) => {
           cacheNames.map((cacheName) => {
             if (cacheName !== STATIC_CACHE && 
                 cacheName !== DYNAMIC_CACHE && 
-                cacheName !== API_CACHE) {
+                cacheName !== API_CACHE &&
+                cacheName !== MODEL_CACHE) {
               console.log('Service Worker: Deleting old cache:', cacheName);
               return caches.delete(cacheName);
             }
@@ -72,8 +84,15 @@ self.addEventListener('fetch', (event) => {
 
   // Handle different types of requests
   if (request.method === 'GET') {
+    // Model files - served from the model cache, refreshed in the background
+    if (isModelFile(url.pathname)) {
+      event.respondWith(cacheFirst(request, MODEL_CACHE));
+      if (url.pathname.endsWith('/model.json')) {
+        event.waitUntil(maybeSyncModelCache());
+      }
+    }
     // Static files - cache first strategy
-    if (isStaticFile(url.pathname)) {
+    else if (isStaticFile(url.pathname)) {
       event.respondWith(cacheFirst(request, STATIC_CACHE));
     }
     // API requests - network first with cache fallback
@@ -159,6 +178,75 @@ async function staleWhileRevalidate(request, cacheName) {
   return cachedResponse || networkResponsePromise;
 }
 
+// Bring the model cache in line with the precache manifest.
+// Hashed shards are immutable, so only new or changed files are downloaded.
+async function syncModelCache() {
+  const response = await fetch(MODEL_MANIFEST_URL, { cache: 'no-cache' });
+  if (!response.ok) {
+    return;
+  }
+
+  const manifest = await response.clone().json();
+  const cache = await caches.open(MODEL_CACHE);
+
+  const previous = await cache.match(MODEL_MANIFEST_URL);
+  const previousRevisions = {};
+  if (previous) {
+    const previousManifest = await previous.json();
+    for (const entry of previousManifest.entries) {
+      previousRevisions[entry.url] = entry.revision;
+    }
+    if (previousManifest.version === manifest.version) {
+      return;
+    }
+  }
+
+  // Shards are listed before model.json, so model.json is stored last
+  const wanted = new Set([new URL(MODEL_MANIFEST_URL, self.location.origin).href]);
+  for (const entry of manifest.entries) {
+    const url = new URL(entry.url, self.location.origin).href;
+    wanted.add(url);
+
+    const cached = await cache.match(url);
+    const unchanged = entry.immutable || previousRevisions[entry.url] === entry.revision;
+    if (cached && unchanged) {
+      continue;
+    }
+
+    const entryResponse = await fetch(entry.url, { cache: 'no-cache' });
+    if (!entryResponse.ok) {
+      throw new Error(`Failed to fetch ${entry.url}: ${entryResponse.status}`);
+    }
+    await cache.put(url, entryResponse);
+  }
+
+  await cache.put(MODEL_MANIFEST_URL, response);
+
+  // Drop shards from previous model versions
+  const cachedRequests = await cache.keys();
+  await Promise.all(
+    cachedRequests
+      .filter((cachedRequest) => !wanted.has(cachedRequest.url))
+      .map((cachedRequest) => cache.delete(cachedRequest))
+  );
+
+  console.log(`Service Worker: Model cache synced (version ${manifest.version})`);
+}
+
+async function maybeSyncModelCache() {
+  const now = Date.now();
+  if (now - lastModelSync < MODEL_SYNC_INTERVAL) {
+    return;
+  }
+  lastModelSync = now;
+
+  try {
+    await syncModelCache();
+  } catch (error) {
+    console.log('Service Worker: Model cache sync failed:', error);
+  }
+}
+
 // Handle POST requests with background sync
 async function handlePostRequest(request) {
   try {
@@ -271,6 +359,10 @@ self.addEventListener('notificationclick', (event) => {
 });
 
 // Helper functions
+function isModelFile(pathname) {
+  return pathname.startsWith('/models/') && pathname !== MODEL_MANIFEST_URL;
+}
+
 function isStaticFile(pathname) {
   return STATIC_FILES.some(file => pathname.includes(file)) ||
          pathname.endsWith('.css') ||
@@ -357,6 +449,11 @@ self.addEventListener('message', (event) => {
     self.skipWaiting();
   }
   
+  if (event.data && event.data.type === 'CHECK_MODEL_UPDATE') {
+    lastModelSync = 0;
+    event.waitUntil(maybeSyncModelCache());
+  }
+  
   if (event.data && event.data.type === 'GET_VERSION') {
     event.ports[0].postMessage({ version: CACHE_NAME });
   }
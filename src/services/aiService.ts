@@ -107,7 +107,7 @@ class AIService {
         // Try to load real TensorFlow.js model first
         try {
           const [model, metadataResponse] = await Promise.all([
-            tf.loadLayersModel('/models/model.json'),
+            tf.loadGraphModel('/models/model.json'),
             fetch('/models/class_mapping.json')
           ]);
 
@@ -196,11 +196,8 @@ class AIService {
 
     try {
       // Preprocess image
-      const tfLib = await loadTensorFlow();
-      const tensor = tfLib.browser.fromPixels(canvas)
-        .resizeNearestNeighbor([224, 224])
-        .expandDims(0)
-        .div(255.0);
+      await loadTensorFlow();
+      const tensor = await this.preprocessImage(imageFile);
 
       // Run inference
       const predictions = this.model.predict(tensor);
@@ -241,12 +238,11 @@ class AIService {
 
         ctx.drawImage(img, 0, 0, 224, 224);
 
-        // Convert to tensor and normalize
+        // The exported model normalizes internally, so feed raw 0-255 pixels
         const imageData = ctx.getImageData(0, 0, 224, 224);
         const tensor = tf.browser.fromPixels(imageData)
           .resizeNearestNeighbor([224, 224])
           .toFloat()
-          .div(255.0)
           .expandDims(0);
 
         resolve(tensor);
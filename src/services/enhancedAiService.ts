@@ -49,6 +49,7 @@ export const ENHANCED_BREED_DATABASE = {
 
 class EnhancedAIService {
   private model: any = null;
+  private tf: any = null;
   private modelMetadata: ModelMetadata | null = null;
   private modelVersion = '2.0.0';
   private isLoading = false;
@@ -107,11 +108,12 @@ class EnhancedAIService {
         
         try {
           const [model, metadataResponse] = await Promise.all([
-            tf.loadLayersModel('/models/model.json'),
+            tf.loadGraphModel('/models/model.json'),
             fetch('/models/class_mapping.json')
           ]);
 
           this.model = model;
+          this.tf = tf;
           this.modelMetadata = await metadataResponse.json();
           
           console.log(`✅ Real model loaded: ${this.modelMetadata.model_info.name}`);
@@ -313,11 +315,14 @@ class EnhancedAIService {
           const imageData = ctx.getImageData(0, 0, 224, 224);
           const quality = this.assessImageQuality(imageData);
 
-          // Create tensor (mock for fallback)
-          const tensor = {
-            dispose: () => {},
-            data: imageData
-          };
+          // The exported model normalizes internally, so feed raw 0-255 pixels
+          const tensor = this.tf
+            ? this.tf.tidy(() => this.tf.browser.fromPixels(canvas).expandDims(0).toFloat())
+            : {
+                // Mock tensor for the fallback models
+                dispose: () => {},
+                data: imageData
+              };
 
           resolve({ tensor, quality });
         } catch (error) {
@@ -473,6 +478,7 @@ class EnhancedAIService {
       this.model.dispose();
     }
     this.model = null;
+    this.tf = null;
     this.modelMetadata = null;
     this.loadPromise = null;
   }